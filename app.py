@@ -1,7 +1,18 @@
 import os
 import shutil
 import time
-from music.automusic import mstart, pretty_json, produce_songnotes, load_song, save_song, SUPPORTED
+STARTED = time.perf_counter()
+from music.automusic import mstart, start_player, pretty_json, load_song, open_collection, retime, save_song, SUPPORTED
+from music.library import Library, UNCONVERTED
+from music.encoding import normalize_file
+from music.convert import get_converter, has_hyperchoron, load_formats, DONE, FAILED
+from music.telemetry import PLAYING, PAUSED
+from music.backend import DirectInputBackend, calibrate
+from music.playlist import Playlist, MODES
+from music.hotkeys import HotkeyService
+from music.songlist import SongIndex, SORT_KEYS
+from music import tracing
+from music.tracing import span
 from config import ConfigHandler
 import dearpygui.dearpygui as dpg
 import threading
@@ -9,11 +20,32 @@ import json
 import orjson
 import sys
 
+# Cold start to first frame should stay under this many seconds; run with --startup-report to check
+STARTUP_BUDGET = 0.5
+DEFERRED_MODULES = ("keyboard", "pydirectinput", "pygetwindow", "chardet")
+startup_marks = [("imports", time.perf_counter())]
+
 music_proc = None
 selected_song = None
+selected_index = 0
+selected_collection = None
+selected_bpm = None
+loop_start = None
+hotkeys = None
+player = None
+song_index = SongIndex()
+song_rows = {}
+song_view = []
+song_sort = ("name", False)
+song_lock = threading.Lock()
+song_changes = set()
+song_dirty = False
+highlighted = None
 config = ConfigHandler("config.json")
 music_folder = config.read_config()["app"]["music_dir"]
 music_folder = music_folder if music_folder else "music/songs/"
+library = Library(music_folder)
+startup_marks.append(("config + library", time.perf_counter()))
 
 def resource_path(relative_path):
 	try:
@@ -25,18 +57,36 @@ def resource_path(relative_path):
 
 def get_music_files():
 	try:
-		if not os.path.exists(music_folder):
-			if os.path.relpath(music_folder).startswith(("music/songs", r"music\songs")):
-				os.makedirs(music_folder, exist_ok=True)
-				return []
-		radio_list = []
-		for midi_file in os.listdir(music_folder):
-			if midi_file.rsplit(".", 1)[-1] in SUPPORTED:
-				radio_list.append(midi_file)
-		return radio_list
-	except:
+		return library.files()
+	except Exception:
 		return []
 
+# Rescans the music folder in the background, re-reading only files that changed since the last scan.
+# The list is synced after every committed batch; a rescan asked for while one runs is folded into it.
+def rescan_library():
+	def scan():
+		with span("library scan") as s:
+			changed = library.scan(sync_song_list)
+			s.set(changed=len(changed or ()))
+		if changed is None:
+			return
+		if changed:
+			show_current_music_speed()
+		if has_hyperchoron():
+			for name in library.with_status(UNCONVERTED):
+				get_converter().submit(os.path.join(music_folder, name))
+	threading.Thread(target=scan, daemon=True).start()
+
+# Re-indexes each file as soon as its background conversion finishes
+def conversion_progress(file_path, status):
+	if status in (DONE, FAILED):
+		if os.path.dirname(file_path) == os.path.abspath(music_folder):
+			library.refresh(os.path.basename(file_path))
+			if os.path.basename(file_path) == selected_song:
+				show_current_music_speed()
+	done, total, _ = get_converter().progress()
+	dpg.set_value("convert_status", f"Converting {done}/{total}..." if done < total else "")
+
 def stop_hotkeys():
 	global music_proc
 	if music_proc:
@@ -44,6 +94,7 @@ def stop_hotkeys():
 		music_proc = None
 		print("Stopped music")
 		dpg.set_item_label("play_btn", "Start")
+		reset_loop()
 
 def copy_music(sender, app_data, user_data):
 	if not app_data['selections']:
@@ -58,61 +109,257 @@ def copy_music(sender, app_data, user_data):
 			shutil.copy(file_path, new_file_path)
 		except Exception as err:
 			raise Exception(f"Error copying {file_path} to {new_file_path}: {err}")
-	dpg.configure_item("radio_btn", items=get_music_files())
+		try:
+			encoding = normalize_file(new_file_path)
+		except OSError:
+			encoding = None
+		if encoding:
+			print(f"Converted {file_name} from {encoding} to UTF-8")
+	rescan_library()
+
+
+# The song list is a clipped table, so only the rows in view are drawn. Rows exist for the songs matching
+# the search; a library change only touches the rows of the files that changed. Scans and callbacks only
+# update the index and mark the list dirty; the render loop redraws it, so rows are made on one thread.
+def sync_song_list(changed=None):
+	"Updates the in-memory index from the library (all of it, or only the changed files) and schedules a redraw."
+	global song_dirty
+	names, rows = get_music_files(), library.entries(changed)
+	with song_lock:
+		song_changes.update(song_index.sync(names, rows)[0])
+		song_dirty = True
+
+def refresh_song_list():
+	global song_dirty
+	song_dirty = True
+
+def apply_song_list():
+	global song_dirty
+	if not song_dirty:
+		return
+	with song_lock:
+		song_dirty = False
+		changed = list(song_changes)
+		song_changes.clear()
+		update_song_list(changed)
+
+# Runs on the render thread with song_lock held
+def update_song_list(changed=()):
+	global song_view
+	view = song_index.view(dpg.get_value("song_search") or "", *song_sort)
+	shown = set(view)
+	for name in [name for name in song_rows if name not in shown]:
+		dpg.delete_item(song_rows.pop(name)[0])
+	for name in changed:
+		if name in song_rows:
+			_, _, bpm, duration = song_rows[name]
+			entry = song_index.get(name)
+			dpg.set_value(bpm, format_bpm(entry))
+			dpg.set_value(duration, format_duration(entry))
+	added = [name for name in view if name not in song_rows]
+	for name in added:
+		add_song_row(name)
+	# New rows are appended, so the table is only reordered when that is not already the right order
+	if [name for name in song_view if name in shown] + added != view:
+		dpg.reorder_items("song_table", 1, [song_rows[name][0] for name in view])
+	song_view = view
+
+def add_song_row(name):
+	entry = song_index.get(name)
+	with dpg.table_row(parent="song_table") as row:
+		selectable = dpg.add_selectable(label=name, span_columns=True, default_value=name == selected_song, callback=select_song_row, user_data=name)
+		bpm = dpg.add_text(format_bpm(entry))
+		duration = dpg.add_text(format_duration(entry))
+	song_rows[name] = (row, selectable, bpm, duration)
+
+def format_bpm(entry):
+	return f"{entry[2]:g}" if entry and entry[2] else ""
+
+def format_duration(entry):
+	if not entry or entry[3] is None:
+		return ""
+	minutes, seconds = divmod(round(entry[3]), 60)
+	return f"{minutes}:{seconds:02}"
+
+# Clicking a row toggles its selectable; highlight_song() then ticks only the selected song's row again
+def select_song_row(sender, app_data, user_data):
+	restart_hotkeys(sender, user_data, None)
+
+def sort_song_list(sender, sort_specs):
+	global song_sort
+	if not sort_specs:
+		return
+	column, direction = sort_specs[0]
+	field = dpg.get_item_user_data(column)
+	if field in SORT_KEYS:
+		song_sort = (field, direction < 0)
+		refresh_song_list()
+
+def highlight_song():
+	global highlighted
+	with song_lock:
+		if highlighted in song_rows:
+			dpg.set_value(song_rows[highlighted][1], False)
+		if selected_song in song_rows:
+			dpg.set_value(song_rows[selected_song][1], True)
+		highlighted = selected_song
 
 
 # Manages the music playback process by starting or stopping it based on the current state
 def music_hotkeys():
-	global music_proc, selected_song, bar_thread
+	global music_proc, selected_song, player
 	if not selected_song:
 		return
 	if not music_proc:
 		f = os.path.join(music_folder, selected_song)
-		music_proc = mstart(f, config)
+		with span("start song", file=f, index=selected_index):
+			# The isolated player process is started with the first song and reused for the rest of the session
+			player = player or start_player(config)
+			music_proc = mstart(f, config, index=selected_index, playlist=make_playlist(), hotkeys=hotkeys, player=player)
 		dpg.set_item_label("play_btn", "Stop")
 		print("Started music")
-		bar_thread = threading.Thread(target=update_progress_bar, args=(), daemon=True)
-		bar_thread.start()
+		proc = music_proc
+		music_proc.telemetry.subscribe(lambda position, duration, state: update_progress_bar(proc, position, duration, state))
 	else:
 		stop_hotkeys()
 		dpg.set_item_label("play_btn", "Start")
 
 
+# Queues every song in the library, starting from the selected one, when a queue mode is chosen
+def make_playlist():
+	mode = config.read_config()["app"]["queue_mode"]
+	if not mode:
+		return None
+	entries = []
+	for name in get_music_files():
+		info = library.get(name)
+		entries.extend((os.path.join(music_folder, name), i) for i in range(info and info["songs"] or 1))
+	current = (os.path.join(music_folder, selected_song), selected_index)
+	if current not in entries:
+		entries.insert(0, current)
+	first = entries.index(current)
+	return Playlist(entries[first:] + entries[:first], mode)
+
 def restart_hotkeys(sender, app_data, user_data):
-	global music_proc, selected_song
-	dpg.configure_item("radio_btn", items=get_music_files())
+	global music_proc, selected_song, selected_index
+	if app_data != selected_song:
+		selected_index = 0
 	selected_song = app_data
+	highlight_song()
+	show_song_choice()
 	show_current_music_speed()
 	print(f"Selected: {selected_song}")
 	if music_proc:
 		stop_hotkeys()
 		music_hotkeys()
 
-def update_progress_bar():
+# Lists the songs inside a multi-song sheet; only the index is read, not the songs themselves
+def show_song_choice():
+	global selected_collection
+	selected_collection = None
+	info = library.get(selected_song) if selected_song else None
+	if info and (info["songs"] or 0) > 1:
+		try:
+			with span("open collection", file=selected_song, songs=info["songs"]):
+				selected_collection = open_collection(os.path.join(music_folder, selected_song), try_hyperchoron=False)
+		except Exception:
+			pass
+	if not selected_collection:
+		dpg.configure_item("song_combo", show=False)
+		return
+	items = [f"{i + 1}. {title}" for i, title in enumerate(selected_collection.titles())]
+	dpg.configure_item("song_combo", items=items, show=True)
+	dpg.set_value("song_combo", items[min(selected_index, len(items) - 1)])
+
+def select_song_index(sender, app_data, user_data):
+	global selected_index
+	selected_index = int(app_data.split(".", 1)[0]) - 1
+	show_current_music_speed()
+	if music_proc:
+		stop_hotkeys()
+		music_hotkeys()
+
+# Called from the player's telemetry notifier whenever progress or playback state changes
+def update_progress_bar(proc, position, duration, state):
 	global music_proc
-	last_progress = 0
-	while music_proc and music_proc.is_alive():
-		progress = music_proc.curr_note / music_proc.max_note
-		if progress != last_progress:
-			last_progress = progress
-			dpg.set_value("progress_bar", min(progress, 1.0))
-		time.sleep(1 / 60)
+	if proc is not music_proc:
+		return
+	if state in (PLAYING, PAUSED):
+		dpg.set_value("progress_bar", min(position / duration, 1.0) if duration else 0)
+		follow_queue(proc)
+		return
 	dpg.set_value("progress_bar", 0)
 	music_proc = None
 	dpg.set_item_label("play_btn", "Start")
+	reset_loop()
+
+# Keeps the song list on the song the queue moved to
+def follow_queue(proc):
+	global selected_song, selected_index
+	name = os.path.basename(proc.file_path)
+	if (name, proc.index) == (selected_song, selected_index):
+		return
+	selected_song, selected_index = name, proc.index
+	highlight_song()
+	show_song_choice()
+	show_current_music_speed()
+	reset_loop()
+
+# Clicking the progress bar moves playback (or the paused position) to that point of the song
+def seek_progress_bar(sender, app_data, user_data):
+	if not music_proc:
+		return
+	x = dpg.get_mouse_pos(local=False)[0] - dpg.get_item_rect_min("progress_bar")[0]
+	width = dpg.get_item_rect_size("progress_bar")[0]
+	if width <= 0:
+		return
+	fraction = min(max(x / width, 0.0), 1.0)
+	dpg.set_value("progress_bar", fraction)
+	music_proc.seek(round(fraction * music_proc.timeline.duration))
+
+# Cycles between marking the loop start, marking the loop end, and clearing the loop
+def toggle_loop(sender, app_data, user_data):
+	global loop_start
+	if not music_proc:
+		return
+	position = music_proc.telemetry.position
+	if music_proc.loop:
+		music_proc.set_loop(None, None)
+		reset_loop()
+	elif loop_start is None:
+		loop_start = position
+		dpg.set_item_label("loop_btn", "A set")
+	elif position > loop_start:
+		music_proc.set_loop(loop_start, position)
+		dpg.set_item_label("loop_btn", "Looping")
+
+def reset_loop():
+	global loop_start
+	loop_start = None
+	dpg.set_item_label("loop_btn", "Loop")
 
 
 def show_current_music_speed():
+	global selected_bpm
+	selected_bpm = None
 	if not selected_song:
 		dpg.set_value("speed_slider", 0)
 		return
-	file_path = os.path.join(music_folder, selected_song)
-	try:
-		data = load_song(file_path)
-	except Exception:
-		dpg.set_value("speed_slider", 0)
-		return
-	dpg.set_value("speed_slider", data[0]["bpm"])
+	if selected_index and selected_collection:
+		try:
+			bpm = selected_collection.song(selected_index).get("bpm")
+		except Exception:
+			bpm = None
+	else:
+		info = library.get(selected_song)
+		bpm = info and info["bpm"]
+	selected_bpm = bpm
+	dpg.set_value("speed_slider", bpm or 0)
+
+# Moving the slider warps the playing song's tempo live; Save is what writes the new bpm to the sheet
+def preview_music_speed(sender, app_data, user_data):
+	if music_proc and selected_bpm and app_data > 0:
+		music_proc.set_speed(app_data / selected_bpm)
 
 def change_current_music_speed(sender, app_data, user_data):
 	global selected_song
@@ -120,13 +367,16 @@ def change_current_music_speed(sender, app_data, user_data):
 		return
 	file_path = os.path.join(music_folder, selected_song)
 	data = load_song(file_path)
-	data[0]["bpm"] = dpg.get_value("speed_slider")
-	produce_songnotes(data[0])
+	song = data[min(selected_index, len(data) - 1)]
+	with span("retime", notes=len(song.get("songNotes") or ())):
+		retime(song, dpg.get_value("speed_slider"))
 	if not file_path.endswith(".skysheet"):
 		file_path = file_path.rsplit(".", 1)[0] + ".skysheet"
-	save_song(data, file_path)
+	save_song(data, file_path, compact=config.read_config()["app"]["compact_saves"])
 	dpg.configure_item("modal_id", show=False)
 	selected_song = file_path.replace("\\", "/").rsplit("/", 1)[-1]
+	library.refresh(selected_song)
+	sync_song_list([selected_song])
 	restart_hotkeys(sender, selected_song, user_data)
 
 def update_hotkeys_binds(sender, app_data, user_data):
@@ -136,28 +386,81 @@ def update_hotkeys_binds(sender, app_data, user_data):
 	time.sleep(0.1)
 	dpg.configure_item("hotkey_popup", show=True)
 	dpg.set_item_label(sender, config.assign_hotkey(user_data))
+	hotkeys.rebind()
 	dpg.configure_item("hotkey_popup", show=False)
 	time.sleep(0.1)
 	dpg.configure_item("advanced_settings", show=True)
 
 def update_music_dir(sender, app_data, user_data):
-	global music_folder
+	global music_folder, library
 	if music_proc:
 		stop_hotkeys()
 	music_dir = app_data["file_path_name"]
 	if os.path.isdir(music_dir):
 		music_folder = music_dir
 		config.set_music_dir(music_folder)
-		dpg.configure_item("radio_btn", items=get_music_files())
+		library.close()
+		library = Library(music_folder)
+		sync_song_list()
+		rescan_library()
 	dpg.configure_item("music_folder_input", default_value=f"{(music_folder[:20] + '...') if len(music_folder) > 40 else music_folder}")
 
 
+def update_compact_saves(sender, app_data, user_data):
+	config.set_compact_saves(app_data)
+
+# Measures how many key events per second this machine can inject; playback thins songs that need more
+def recalibrate_input(sender, app_data, user_data):
+	backend = DirectInputBackend()
+	backend.bind(config.read_config().note_keys)
+	rate = round(calibrate(backend))
+	config.set_calibrated_key_rate(rate)
+	dpg.set_value("key_rate_text", f"{rate} keys/s")
+
+def update_profiling(sender, app_data, user_data):
+	mode = "" if app_data == "off" else app_data
+	config.set_profiling(mode)
+	tracing.enable(mode, config.read_config()["playback"]["trace_dir"])
+
+def update_queue_mode(sender, app_data, user_data):
+	config.set_queue_mode("" if app_data == "off" else app_data)
+
 def update_always_on_top(sender, app_data, user_data):
 	dpg.configure_viewport(0, always_on_top=app_data)
 	config.set_always_on_top(app_data)
 
+def add_file_extensions(formats):
+	if not dpg.does_item_exist("file_picker"):
+		return
+	for fmt in formats:
+		dpg.add_file_extension(fmt, parent="file_picker")
+
+def formats_loaded(added):
+	add_file_extensions(sorted(added))
+	if dpg.does_item_exist("song_table"):
+		rescan_library()
+
+def report_startup(sender=None, app_data=None):
+	startup_marks.append(("first frame", time.perf_counter()))
+	print("Startup report:")
+	last = STARTED
+	for name, t in startup_marks:
+		print(f"  {name:<20} {(t - last) * 1000:8.1f} ms")
+		last = t
+	total = last - STARTED
+	print(f"  {'total':<20} {total * 1000:8.1f} ms ({'within' if total <= STARTUP_BUDGET else 'OVER'} {STARTUP_BUDGET * 1000:.0f} ms budget)")
+	loaded = [name for name in DEFERRED_MODULES if name in sys.modules]
+	if loaded:
+		print(f"  eagerly imported: {', '.join(loaded)}")
+
 def main():
-	global selected_song
+	global selected_song, hotkeys
+	profiling = config.read_config()["app"]["profiling"]
+	if profiling and not tracing.mode:
+		tracing.enable(profiling, config.read_config()["playback"]["trace_dir"])
+	load_formats(formats_loaded)
+	# Hooked on the first Start and kept for the whole session; each song attaches its player to it
+	hotkeys = HotkeyService(config)
 	dpg.create_context()
 	apply_dark_purple_theme()
 	dpg.create_viewport(title='Sky AutoMusic PC', width=800, height=600, always_on_top=config.read_config()["app"]["always_on_top"])
@@ -175,24 +478,38 @@ def main():
 				dpg.add_menu_item(label="About", callback=lambda: dpg.show_item("about_window"))
 
 		with dpg.child_window(tag="content_area", autosize_x=True, height=-50, horizontal_scrollbar=False):
-			dpg.add_text("Songs:")
-			radio_list = get_music_files()
-			with dpg.group(horizontal=False, tag="music_list"):
-				dpg.add_radio_button(items=radio_list, callback=restart_hotkeys, default_value=False, tag="radio_btn")
+			with dpg.group(horizontal=True):
+				dpg.add_text("Songs:")
+				dpg.add_text("", tag="convert_status", color=(150, 150, 180))
+			dpg.add_combo(tag="song_combo", show=False, callback=select_song_index, width=-1)
+			dpg.add_input_text(tag="song_search", hint="Search songs", width=-1, callback=refresh_song_list)
+			with dpg.table(tag="song_table", header_row=True, clipper=True, sortable=True, callback=sort_song_list, scrollY=True, freeze_rows=1, height=-1, row_background=True, policy=dpg.mvTable_SizingStretchProp):
+				dpg.add_table_column(label="Name", user_data="name", default_sort=True, width_stretch=True, init_width_or_weight=1.0)
+				dpg.add_table_column(label="BPM", user_data="bpm", width_fixed=True, init_width_or_weight=60)
+				dpg.add_table_column(label="Length", user_data="duration", width_fixed=True, init_width_or_weight=60)
+		sync_song_list()
+		apply_song_list()
 
 		# Docked bottom bar
 		with dpg.group(horizontal=True):
 			dpg.add_button(label="Start", tag="play_btn", width=60, callback=music_hotkeys)
-			dpg.add_progress_bar(tag="progress_bar", default_value=0.0, width=600)
+			dpg.add_progress_bar(tag="progress_bar", default_value=0.0, width=520)
+			with dpg.item_handler_registry(tag="progress_handlers"):
+				dpg.add_item_clicked_handler(callback=seek_progress_bar)
+			dpg.bind_item_handler_registry("progress_bar", "progress_handlers")
+			dpg.add_button(label="Loop", tag="loop_btn", width=70, callback=toggle_loop)
 			dpg.add_button(label="Edit..", width=70, tag="settings_btn")
 
 			with dpg.popup(dpg.last_item(), mousebutton=dpg.mvMouseButton_Left, modal=True, tag="modal_id"):
 				dpg.add_text("Change current music speed (Press Ctrl + LMB to input manually)")
-				dpg.add_slider_int(label="", min_value=1, max_value=1600, default_value=1, tag="speed_slider", no_input=False)
+				dpg.add_text("Changes apply live while playing; press Save to keep them in the sheet", color=(150, 150, 180))
+				dpg.add_slider_int(label="", min_value=1, max_value=1600, default_value=1, tag="speed_slider", no_input=False, callback=preview_music_speed)
 				dpg.add_button(label="Save", callback=change_current_music_speed)
 
-		if radio_list:
-			selected_song = radio_list[0]
+		if song_view:
+			selected_song = song_view[0]
+			highlight_song()
+			show_song_choice()
 			show_current_music_speed()
 
 	with dpg.window(label="How to use?", tag="howto_window", show=False, modal=True, width=750, height=400):
@@ -203,7 +520,9 @@ def main():
 		dpg.add_separator()
 		dpg.add_text("3. Choose the music from the list and press 'Start'. " \
 		"\nAfter that the app will wait for you to press a Start keybind while in the game.")
-		dpg.add_text("You can press pause keybind to stop the music while it is playing")
+		dpg.add_text("You can press pause keybind to stop the music while it is playing, and the Play key again to resume")
+		dpg.add_text("Click the progress bar to jump within the song; 'Loop' marks a start and an end to repeat a section")
+		dpg.add_text("With a play queue set in the settings, the next songs of the list follow on their own")
 		dpg.add_text("Buttons are V and B by default. You can change both keybinds in the settings.", color=(0, 255, 0))
 		dpg.add_separator()
 		dpg.add_text("4. Press the 'Edit' button and change the music speed.")
@@ -245,6 +564,24 @@ def main():
 			dpg.add_text("Always on top: ")
 			dpg.add_checkbox(default_value=config.read_config()["app"]["always_on_top"], callback=update_always_on_top)
 
+		with dpg.group(horizontal=True):
+			dpg.add_text("Compact sheet saves: ")
+			dpg.add_checkbox(default_value=config.read_config()["app"]["compact_saves"], callback=update_compact_saves)
+
+		with dpg.group(horizontal=True):
+			dpg.add_text("Play queue: ")
+			dpg.add_combo(("off",) + MODES, default_value=config.read_config()["app"]["queue_mode"] or "off", callback=update_queue_mode, width=120)
+
+		with dpg.group(horizontal=True):
+			dpg.add_text("Profiling: ")
+			dpg.add_combo(("off",) + tracing.MODES, default_value=tracing.mode or "off", callback=update_profiling, width=120)
+
+		with dpg.group(horizontal=True):
+			dpg.add_text("Input speed: ")
+			rate = config.read_config()["playback"]["calibrated_key_rate"]
+			dpg.add_text(f"{rate:.0f} keys/s" if rate else "not measured", tag="key_rate_text")
+			dpg.add_button(label="Calibrate", callback=recalibrate_input, width=80)
+
 		with dpg.group(horizontal=True):
 			dpg.add_text("Music folder: ")
 			dpg.add_input_text(default_value=f"{(music_folder[:20] + '..') if len(music_folder) > 40 else music_folder}", tag="music_folder_input", readonly=True, width=200)
@@ -258,8 +595,8 @@ def main():
 
 
 	with dpg.file_dialog(directory_selector=False, show=False, callback=copy_music, tag="file_picker", width=700, height=400):
-		for fmt in SUPPORTED:
-			dpg.add_file_extension(fmt)
+		pass
+	add_file_extensions(sorted(SUPPORTED))
 
 
 	# Resize the child window to leave 90px for the bottom bar
@@ -272,11 +609,22 @@ def main():
 
 	dpg.set_viewport_resize_callback(resize_content)
 	resize_content(None, None)
+	startup_marks.append(("build ui", time.perf_counter()))
 	dpg.setup_dearpygui()
 	dpg.show_viewport()
-	dpg.start_dearpygui()
+	if "--startup-report" in sys.argv:
+		dpg.set_frame_callback(1, report_startup)
+	get_converter().subscribe(conversion_progress)
+	rescan_library()
+	while dpg.is_dearpygui_running():
+		apply_song_list()
+		dpg.render_dearpygui_frame()
 	dpg.destroy_context()
 	stop_hotkeys()
+	hotkeys.close()
+	if player:
+		player.close()
+	get_converter().shutdown()
 
 def apply_dark_purple_theme():
 	with dpg.theme() as global_theme:
@@ -325,4 +673,7 @@ def apply_dark_purple_theme():
 
 
 if __name__ == "__main__":
+	# The isolated player runs in a spawned process, which frozen builds have to route here
+	import multiprocessing
+	multiprocessing.freeze_support()
 	main()
@@ -0,0 +1,83 @@
+import argparse
+import sys
+import threading
+import time
+import numpy as np
+from benchmarks.sheets import make_song
+from music.automusic import PreparedSong
+from music.backend import RecordingBackend
+from music.isolated import PlayerProcess, RemoteScheduler
+from music.scheduler import Scheduler, scheduler_options
+from music.telemetry import Telemetry
+from music.timeline import Timeline, compile_song
+
+# Compares dispatch lateness with the scheduler in the GUI process and in the isolated player process,
+# while threads imitate GUI work: each runs pure Python for --busy-ms, then idles for the rest of a frame.
+#   python -m benchmarks.isolation [--seconds 5] [--load 2] [--busy-ms 12] [--interval-ms 10]
+# Nothing is injected; both runs play through a RecordingBackend.
+
+PLAYBACK = dict(spin_threshold_ms=2.0, late_policy="catchup", drop_late_ms=150.0, hold_ms=40.0)
+
+
+def gui_load(stop, busy, frame=1 / 60):
+	while not stop.is_set():
+		start = time.perf_counter()
+		end = start + busy
+		n = 0
+		while time.perf_counter() < end:
+			n = sum(range(200)) + n & 0xffff
+		time.sleep(max(0, frame - (time.perf_counter() - start)))
+
+def make_timeline(seconds, interval):
+	count = int(seconds * 1e9 / interval)
+	masks = compile_song(make_song(count * 3, 3)).masks
+	return Timeline(np.arange(len(masks), dtype=np.int64) * interval, masks)
+
+def in_process(timeline, telemetry):
+	Scheduler(RecordingBackend(capacity=4 * len(timeline) + 16).dispatch, telemetry=telemetry).play(timeline.times.tolist(), timeline.masks.tolist())
+
+def isolated(timeline, player):
+	song = PreparedSong(None, 0, timeline, 0)
+	RemoteScheduler(player, song, options=scheduler_options(PLAYBACK)).play()
+
+def under_load(run, threads, busy):
+	stop = threading.Event()
+	workers = [threading.Thread(target=gui_load, args=(stop, busy), daemon=True) for _ in range(threads)]
+	for worker in workers:
+		worker.start()
+	try:
+		run()
+	finally:
+		stop.set()
+		for worker in workers:
+			worker.join()
+
+def format_stats(label, stats):
+	return f"{label:<12} lateness p50 {stats['p50'] / 1e3:8.1f} us  p99 {stats['p99'] / 1e3:8.1f} us  max {stats['max'] / 1e3:8.1f} us ({stats['events']} chords)"
+
+def main(argv=None):
+	parser = argparse.ArgumentParser(prog="python -m benchmarks.isolation", description="Compares in-process and isolated dispatch lateness under synthetic GUI load.")
+	parser.add_argument("--seconds", type=float, default=5.0, help="length of the played excerpt")
+	parser.add_argument("--interval-ms", type=float, default=10.0, help="time between chords")
+	parser.add_argument("--load", type=int, default=2, help="number of GUI-like threads")
+	parser.add_argument("--busy-ms", type=float, default=12.0, help="Python work per 60 Hz frame in each load thread")
+	parser.add_argument("--affinity", default="", help="comma-separated CPUs to pin the player process to")
+	args = parser.parse_args(argv)
+
+	timeline = make_timeline(args.seconds, round(args.interval_ms * 1e6))
+	busy = args.busy_ms / 1e3
+	affinity = tuple(map(int, args.affinity.split(","))) if args.affinity else ()
+	telemetry = Telemetry(len(timeline))
+	under_load(lambda: in_process(timeline, telemetry), args.load, busy)
+	print(format_stats("in-process", telemetry.stats()), flush=True)
+	player = PlayerProcess(backend=RecordingBackend.name, affinity=affinity, capacity=len(timeline))
+	try:
+		under_load(lambda: isolated(timeline, player), args.load, busy)
+		print(format_stats("isolated", player.telemetry.stats()), flush=True)
+	finally:
+		player.close()
+	return 0
+
+
+if __name__ == "__main__":
+	sys.exit(main())
@@ -0,0 +1,138 @@
+import argparse
+import copy
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+import orjson
+from benchmarks.sheets import DENSITIES, FORMS, make_song
+from music.automusic import load_song, pretty_json, produce_songnotes, read_json_file, save_song
+from music.backend import RecordingBackend
+from music.scheduler import Scheduler
+from music.timeline import compile_song
+
+# Benchmarks for the sheet pipeline and the dispatcher, on synthetic sheets.
+#   python -m benchmarks.run [--sizes 1000,10000,100000] [--save NAME] [--compare NAME]
+# Each case reports the best time over --repeat runs, notes per second and peak traced memory.
+# The scheduler case plays an excerpt in real time, one chord per interval, through a recording
+# backend (nothing is injected) and reports lateness percentiles.
+# Baselines are saved as JSON in benchmarks/baselines, and --compare prints the time ratio per case.
+
+BASELINES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines")
+SIZES = (1000, 10000, 100000)
+
+
+def measure(func, repeat=3, setup=None):
+	"Returns (best seconds over repeat runs, peak traced bytes of one extra run)."
+	# Tracing slows allocation down, so memory is measured on a separate run, which also warms caches
+	arg = setup() if setup else None
+	tracemalloc.start()
+	func(arg) if setup else func()
+	peak = tracemalloc.get_traced_memory()[1]
+	tracemalloc.stop()
+	best = float("inf")
+	for _ in range(repeat):
+		arg = setup() if setup else None
+		start = time.perf_counter()
+		func(arg) if setup else func()
+		best = min(best, time.perf_counter() - start)
+	return best, peak
+
+def scheduler_lateness(song, excerpt=2.0, interval=10_000_000):
+	"Plays excerpt seconds of song's chords, one per interval ns, through a RecordingBackend; returns lateness in ns."
+	timeline = compile_song(song)
+	end = min(len(timeline), int(excerpt * 1e9 / interval))
+	backend = RecordingBackend(capacity=4 * end + 16)
+	times = np.arange(end, dtype=np.int64) * interval
+	Scheduler(backend.dispatch, lead_in=50_000_000).play(times, timeline.masks[:end])
+	late = backend.lateness()
+	if not len(late):
+		return dict(p50=0, p99=0, max=0, chords=0)
+	p50, p99 = np.percentile(late, [50, 99])
+	return dict(p50=int(p50), p99=int(p99), max=int(late.max()), chords=int(len(late)))
+
+def run_case(notes, density, form, folder, repeat=3, excerpt=2.0, interval=10_000_000):
+	chord = DENSITIES[density]
+	song = make_song(notes, chord, form)
+	data = [song]
+	path = os.path.join(folder, f"{notes}-{density}-{form}.json")
+	save_song(data, path, compact=True)
+	cases = {
+		"read_json_file": lambda: read_json_file(path, try_hyperchoron=False),
+		"load_song": lambda: load_song(path, try_hyperchoron=False),
+		"pretty_json": lambda: pretty_json(data),
+		"save_song": lambda: save_song(data, path),
+		"save_song_compact": lambda: save_song(data, path, compact=True),
+	}
+	results = []
+	for name, func in cases.items():
+		seconds, peak = measure(func, repeat)
+		results.append(dict(case=name, seconds=seconds, peak=peak))
+	seconds, peak = measure(produce_songnotes, repeat, setup=lambda: copy.deepcopy(song))
+	results.append(dict(case="produce_songnotes", seconds=seconds, peak=peak))
+	produced = copy.deepcopy(song)
+	produce_songnotes(produced)
+	seconds, peak = measure(lambda: compile_song(produced), repeat)
+	results.append(dict(case="compile_song", seconds=seconds, peak=peak))
+	for result in results:
+		result.update(notes=notes, density=density, form=form, rate=notes / result["seconds"] if result["seconds"] else 0)
+	if form == FORMS[0] and excerpt:
+		late = scheduler_lateness(produced, excerpt, interval)
+		results.append(dict(case="scheduler", notes=notes, density=density, form=form, seconds=0, peak=0, rate=0, **late))
+	return results
+
+def key(result):
+	return f"{result['case']}/{result['notes']}/{result['density']}/{result['form']}"
+
+def format_result(result, baseline=None):
+	label = f"{result['case']:<18} {result['notes']:>8} {result['density']:<7} {result['form']:<9}"
+	if result["case"] == "scheduler":
+		line = f"{label} lateness p50 {result['p50'] / 1e3:8.1f} us  p99 {result['p99'] / 1e3:8.1f} us  max {result['max'] / 1e3:8.1f} us ({result['chords']} chords)"
+		if baseline:
+			line += f"  [baseline p99 {baseline['p99'] / 1e3:.1f} us]"
+		return line
+	line = f"{label} {result['seconds'] * 1e3:10.2f} ms {result['rate'] / 1e6:8.2f} M notes/s  peak {result['peak'] / 2 ** 20:8.1f} MiB"
+	if baseline and baseline["seconds"]:
+		ratio = result["seconds"] / baseline["seconds"]
+		line += f"  x{ratio:.2f}" + (" SLOWER" if ratio > 1.2 else "")
+	return line
+
+def main(argv=None):
+	parser = argparse.ArgumentParser(prog="python -m benchmarks.run", description="Benchmarks the sheet pipeline and the dispatcher on synthetic sheets.")
+	parser.add_argument("--sizes", default=",".join(map(str, SIZES)), help="comma-separated note counts (up to 1000000)")
+	parser.add_argument("--densities", default=",".join(DENSITIES), help="comma-separated chord densities: " + ", ".join(DENSITIES))
+	parser.add_argument("--forms", default=",".join(FORMS), help="comma-separated sheet forms: " + ", ".join(FORMS))
+	parser.add_argument("--repeat", type=int, default=3, help="runs per case; the best time is reported")
+	parser.add_argument("--excerpt", type=float, default=2.0, help="seconds of each song played in the scheduler case; 0 skips it")
+	parser.add_argument("--interval-ms", type=float, default=10.0, help="time between chords in the scheduler case")
+	parser.add_argument("--save", metavar="NAME", help="save the results as a baseline")
+	parser.add_argument("--compare", metavar="NAME", help="compare against a saved baseline")
+	args = parser.parse_args(argv)
+
+	baseline = {}
+	if args.compare:
+		with open(os.path.join(BASELINES, f"{args.compare}.json"), "rb") as f:
+			baseline = {key(result): result for result in orjson.loads(f.read())["results"]}
+	results = []
+	with tempfile.TemporaryDirectory() as folder:
+		for notes in map(int, args.sizes.split(",")):
+			for density in args.densities.split(","):
+				for form in args.forms.split(","):
+					for result in run_case(notes, density, form, folder, args.repeat, args.excerpt, round(args.interval_ms * 1e6)):
+						print(format_result(result, baseline.get(key(result))), flush=True)
+						results.append(result)
+	if args.save:
+		os.makedirs(BASELINES, exist_ok=True)
+		path = os.path.join(BASELINES, f"{args.save}.json")
+		info = dict(python=sys.version.split()[0], numpy=np.__version__, machine=platform.machine(), system=platform.system(), created=time.strftime("%Y-%m-%dT%H:%M:%S"))
+		with open(path, "wb") as f:
+			f.write(orjson.dumps(dict(info=info, results=results), option=orjson.OPT_INDENT_2))
+		print(f"Saved baseline to {path}", file=sys.stderr)
+	return 0
+
+
+if __name__ == "__main__":
+	sys.exit(main())
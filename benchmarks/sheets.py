@@ -0,0 +1,26 @@
+import numpy as np
+from music.notes import columns_to_songnotes
+
+# Synthetic sheets for benchmarking. Every chord is one column (one beat at bpm) holding
+# `chord` distinct keys, so the same (notes, chord, seed) always produces the same song.
+
+DENSITIES = {"sparse": 1, "chords": 3, "dense": 6}
+FORMS = ("songNotes", "columns")
+
+
+def make_columns(notes, chord=1, seed=0):
+	rng = np.random.default_rng(seed)
+	count = max(1, notes // chord)
+	keys = np.argsort(rng.random((count, 15)), axis=1)[:, :chord].tolist()
+	return [[0, [[key, "1"] for key in chord_keys]] for chord_keys in keys]
+
+def make_song(notes, chord=1, form="songNotes", bpm=600, seed=0):
+	"Returns a sheet-style song with about notes notes, in songNotes or columns form."
+	columns = make_columns(notes, chord, seed)
+	song = {"name": f"bench-{notes}-{chord}", "bpm": bpm, "bitsPerPage": 16, "pitchLevel": 0, "isComposed": True}
+	if form == "columns":
+		song["columns"] = columns
+		song["songNotes"] = []
+	else:
+		song["songNotes"] = columns_to_songnotes(columns, bpm)
+	return song
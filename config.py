@@ -1,5 +1,8 @@
-import keyboard
+import atexit
 import json
+import threading
+from types import MappingProxyType
+from music.atomic import atomic_write
 
 
 SCHEMA = {
@@ -32,37 +35,143 @@ SCHEMA = {
     },
     "app": {
         "always_on_top": True,
-        "music_dir": "music/songs"
+        "music_dir": "music/songs",
+        "compact_saves": False,
+        "queue_mode": "",
+        "profiling": ""
+    },
+    "playback": {
+        "spin_threshold_ms": 2.0,
+        "late_policy": "catchup",
+        "drop_late_ms": 150.0,
+        "hold_ms": 40.0,
+        "chord_window_ms": 3.0,
+        "retrigger_gap_ms": 10.0,
+        "max_key_rate": 0.0,
+        "calibrated_key_rate": 0.0,
+        "density_priority": "top",
+        "song_gap_ms": 1000.0,
+        "auto_pause": True,
+        "focus_poll_ms": 250.0,
+        "isolated": False,
+        "cpu_affinity": [],
+        "trace_dir": ""
     }
 }
 
+# read_config() hands out an immutable snapshot that is rebuilt only after a setting changes,
+# reusing the frozen sections that did not change. Saves are debounced and written atomically.
+
+NOTE_COUNT = 15
+SAVE_DELAY = 0.5
+
+
+def freeze(obj):
+    if isinstance(obj, dict):
+        return MappingProxyType({key: freeze(value) for key, value in obj.items()})
+    if isinstance(obj, list):
+        return tuple(freeze(value) for value in obj)
+    return obj
+
+
+def with_defaults(loaded):
+    """Merges loaded over SCHEMA section by section, so settings missing from an older file keep their defaults."""
+    config = json.loads(json.dumps(SCHEMA))
+    for name, section in loaded.items():
+        if isinstance(section, dict) and isinstance(config.get(name), dict):
+            config[name].update(section)
+        else:
+            config[name] = section
+    return config
+
+
+class ConfigSnapshot:
+    """Read-only view of the config at one version, with the note index -> key name table precompiled."""
+
+    def __init__(self, version, sections, note_keys):
+        self.version = version
+        self.sections = sections
+        self.note_keys = note_keys
+
+    def __getitem__(self, name):
+        return self.sections[name]
+
+    def __contains__(self, name):
+        return name in self.sections
+
+    def get(self, name, default=None):
+        return self.sections.get(name, default)
+
+
 class ConfigHandler:
-    def __init__(self, file_path):
+    def __init__(self, file_path, save_delay=SAVE_DELAY):
         self.file_path = file_path
+        self.save_delay = save_delay
+        self.lock = threading.RLock()
+        self.version = 0
+        self._sections = {}
+        self._note_keys = None
+        self._snapshot = None
+        self._timer = None
         self._load()
+        atexit.register(self.flush)
     
     def _load(self):
         try:
             with open(self.file_path, 'r') as f:
-                self._config = json.load(f)
-                self._config = {**SCHEMA, **self._config}
+                self._config = with_defaults(json.load(f))
         except (FileNotFoundError, json.JSONDecodeError):
-            self._config = SCHEMA
-            self.save()
+            self._config = json.loads(json.dumps(SCHEMA))
+            self.flush(force=True)
+
+    def _changed(self, section):
+        with self.lock:
+            self.version += 1
+            self._sections.pop(section, None)
+            if section == "music":
+                self._note_keys = None
+            self._snapshot = None
+        self.save()
     
     def save(self):
-        if not self._config:
-            return
+        """Schedules a write; changes made within save_delay of each other are written together."""
+        with self.lock:
+            if self._timer:
+                self._timer.cancel()
+            self._timer = threading.Timer(self.save_delay, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def flush(self, force=False):
+        with self.lock:
+            if self._timer:
+                self._timer.cancel()
+                self._timer = None
+            elif not force:
+                return
+            if not self._config:
+                return
+            data = json.dumps(self._config, indent=4)
         try:
-            with open(self.file_path, 'w') as f:
-                json.dump(self._config, f, indent=4)
+            with atomic_write(self.file_path, 'w') as f:
+                f.write(data)
         except (FileNotFoundError, IOError, TypeError) as e:
             raise Exception(f"Failed to save config at {self.file_path}: {e}")
     
     def read_config(self):
-        return {**self._config}
+        snapshot = self._snapshot
+        if snapshot is None:
+            with self.lock:
+                sections = {name: self._sections.get(name) or freeze(value) for name, value in self._config.items()}
+                self._sections = dict(sections)
+                if self._note_keys is None:
+                    key_mapping = sections["music"]["key_mapping"]
+                    self._note_keys = tuple(key_mapping.get(str(i)) or "" for i in range(NOTE_COUNT))
+                snapshot = self._snapshot = ConfigSnapshot(self.version, MappingProxyType(sections), self._note_keys)
+        return snapshot
     
     def assign_hotkey(self, field):
+        import keyboard
         event = keyboard.read_event(suppress=True)
         if event.event_type == keyboard.KEY_DOWN and event.name != 'esc':
             scan_code = event.scan_code
@@ -74,14 +183,30 @@ class ConfigHandler:
             else:
                 self._config["music"]["key_mapping"][field] = field_config
 
-            self.save()
+            self._changed("music")
 
             return name
     
     def set_always_on_top(self, value):
         self._config["app"]["always_on_top"] = value
-        self.save()
+        self._changed("app")
+
+    def set_compact_saves(self, value):
+        self._config["app"]["compact_saves"] = value
+        self._changed("app")
+
+    def set_profiling(self, value):
+        self._config["app"]["profiling"] = value
+        self._changed("app")
+
+    def set_queue_mode(self, value):
+        self._config["app"]["queue_mode"] = value
+        self._changed("app")
+
+    def set_calibrated_key_rate(self, value):
+        self._config["playback"]["calibrated_key_rate"] = value
+        self._changed("playback")
 
     def set_music_dir(self, value):
         self._config["app"]["music_dir"] = value
-        self.save()
+        self._changed("app")
@@ -0,0 +1,31 @@
+import contextlib
+import os
+import stat
+import threading
+
+# Files are written to a temporary file beside the target and renamed over it once complete, so
+# readers and crashes never see a half-written sheet, cache or config.
+
+
+@contextlib.contextmanager
+def atomic_write(path, mode="wb", fsync=False, **kwargs):
+	"Opens a temporary file for `with atomic_write(path) as f: f.write(...)` that replaces path when the block succeeds; path keeps its permissions."
+	tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+	try:
+		# Created like any new file (respecting the umask), unlike mkstemp's 0600
+		with open(tmp, mode.replace("w", "x"), **kwargs) as f:
+			yield f
+			if fsync:
+				f.flush()
+				os.fsync(f.fileno())
+		try:
+			os.chmod(tmp, stat.S_IMODE(os.stat(path).st_mode))
+		except FileNotFoundError:
+			pass
+		os.replace(tmp, path)
+	except BaseException:
+		try:
+			os.remove(tmp)
+		except OSError:
+			pass
+		raise
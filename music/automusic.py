@@ -1,27 +1,26 @@
 import concurrent.futures
+import datetime
 import json
 import os
-import subprocess
 import threading
 import time
-import keyboard
-import pydirectinput
-pydirectinput.PAUSE = 0
-import pygetwindow as gw
-import chardet
+from collections import deque
+from operator import itemgetter
+import numpy as np
 import orjson
-
-SUPPORTED = {"txt", "json", "skysheet"}
-
-try:
-	s = subprocess.check_output(["hyperchoron", "-lf"], encoding="utf-8")
-except (FileNotFoundError, subprocess.CalledProcessError):
-	has_hyperchoron = False
-else:
-	has_hyperchoron = True
-	_, encoders = s.split("# Encoders:\n", 1)
-	encoders, decoders = encoders.split("\n# Decoders:\n", 1)
-	SUPPORTED.update(decoders.splitlines())
+from music.atomic import atomic_write
+from music.backend import DirectInputBackend
+from music.collection import SongCollection
+from music.encoding import normalize
+from music.focus import FocusMonitor, PyGetWindowQuery
+from music.hotkeys import HotkeyService
+from music.convert import converted_path, get_converter, has_hyperchoron, is_converted, SUPPORTED
+from music.notes import columns_to_songnotes, songnotes_to_columns, retime
+from music.isolated import PlayerProcess, RemoteScheduler
+from music.scheduler import Scheduler, scheduler_options
+from music.telemetry import Telemetry, PLAYING, PAUSED, FINISHED
+from music.tracing import span
+from music.timeline import Timeline, compile_song, content_key, cache_path, CHORD_WINDOW, RETRIGGER_GAP
 
 
 def json_default(obj):
@@ -29,7 +28,7 @@ def json_default(obj):
 		return obj.strftime("%Y-%m-%dT%H:%M:%S")
 	if isinstance(obj, np.number):
 		return obj.item()
-	if isinstance(obj, (set, frozenset, alist, deque, np.ndarray)):
+	if isinstance(obj, (set, frozenset, deque, np.ndarray)):
 		return list(obj)
 	raise TypeError(obj)
 
@@ -43,193 +42,471 @@ def json_dumps(obj, *args, **kwargs):
 def json_dumpstr(obj, *args, **kwargs):
 	return orjson.dumps(obj, *args, default=json_default, **kwargs).decode("utf-8", "replace")
 
-class PrettyJSONEncoder(json.JSONEncoder):
+def json_short(obj, limit=10):
+	"Returns json_dumpstr(obj) if it is shorter than limit, else None; obviously long containers are never serialized."
+	n = 1 + max(1, len(obj))
+	if isinstance(obj, dict):
+		n += len(obj)
+		for k, v in obj.items():
+			n += len(k) + 2 if type(k) is str else 1
+			n += len(v) + 2 if type(v) is str else 1
+	else:
+		for v in obj:
+			n += len(v) + 2 if type(v) is str else 1
+	if n >= limit:
+		return None
+	b = json_dumps(obj)
+	return b.decode("utf-8", "replace") if len(b) < limit else None
+
+class PrettyJSONWriter:
+	"Streams the same layout PrettyJSONEncoder used to build in memory, serializing every value once."
+
+	def __init__(self, write, indent="\t", chunk=4096):
+		self.indent = " " * indent if type(indent) is int else indent
+		self.out = write
+		self.chunk = chunk
+		self.parts = []
+		self.keys = {}
+		self.indents = {}
+
+	def flush(self):
+		if self.parts:
+			self.out("".join(self.parts))
+			self.parts.clear()
+
+	def dump(self, obj):
+		self.encode(obj)
+		self.flush()
+
+	def key(self, k):
+		try:
+			return self.keys[k]
+		except KeyError:
+			pass
+		s = self.keys[k] = json_dumpstr(k) + ": "
+		return s
 
-	def __init__(self, *args, **kwargs):
-		self.indent = kwargs.get("indent") or "\t"
-		super().__init__(*args, **kwargs)
+	def separators(self, level):
+		try:
+			return self.indents[level]
+		except KeyError:
+			pass
+		next_indent = self.indent * (level + 1)
+		seps = self.indents[level] = ("\n" + next_indent, ",\n" + next_indent, "\n" + self.indent * level)
+		return seps
 
 	def encode(self, obj, level=0):
-		indent = " " * self.indent if type(self.indent) is int else self.indent
-		curr_indent = indent * level
-		next_indent = indent * (level + 1)
+		parts = self.parts
 		if isinstance(obj, (list, tuple)):
-			if all(not isinstance(x, (tuple, list, dict)) or len(json_dumps(x)) < 10 for x in obj):
-				return "[" + ", ".join(json_dumpstr(x) for x in obj) + "]"
-			items = [self.encode(x, level=level + 1) for x in obj]
-			return "[\n" + next_indent + f",\n{next_indent}".join(item for item in items) + f"\n{curr_indent}" + "]"
+			inline = []
+			for x in obj:
+				if isinstance(x, (tuple, list, dict)):
+					x = json_short(x)
+					if x is None:
+						break
+					inline.append(x)
+				else:
+					inline.append(json_dumpstr(x))
+			else:
+				parts.append("[" + ", ".join(inline) + "]")
+				return
+			first, sep, last = self.separators(level)
+			parts.append("[" + first)
+			for i, x in enumerate(obj):
+				if i:
+					parts.append(sep)
+				if i < len(inline) and not isinstance(x, (tuple, list, dict)):
+					parts.append(inline[i])
+				else:
+					self.encode(x, level + 1)
+			parts.append(last + "]")
 		elif isinstance(obj, dict):
 			if all(type(x) is str and len(x) <= max(10, len(obj)) for x in obj.values()) and all(type(x) is str and len(x) <= max(10, len(obj)) for x in obj.keys()):
-				return json.dumps(obj)
-			items = [f"{json_dumpstr(k)}: {self.encode(v, level=level + 1)}" for k, v in obj.items()]
-			items.sort()
-			return "{\n" + next_indent + f",\n{next_indent}".join(item for item in items) + f"\n{curr_indent}" + "}"
-		return json_dumpstr(obj)
-
-	def default(self, obj):
-		return json_default(obj)
-
-prettyjsonencoder = PrettyJSONEncoder(indent="\t")
-pretty_json = lambda obj: prettyjsonencoder.encode(obj)
-
+				parts.append(json.dumps(obj))
+				return
+			first, sep, last = self.separators(level)
+			items = sorted([(self.key(k), v) for k, v in obj.items()], key=itemgetter(0))
+			for k, v in items:
+				if isinstance(v, (tuple, list, dict)):
+					break
+			else:
+				parts.append("{" + first + sep.join([k + json_dumpstr(v) for k, v in items]) + last + "}")
+				return
+			parts.append("{" + first)
+			for i, (k, v) in enumerate(items):
+				if i:
+					parts.append(sep)
+				parts.append(k)
+				self.encode(v, level + 1)
+			parts.append(last + "}")
+		else:
+			parts.append(json_dumpstr(obj))
+		if len(parts) >= self.chunk:
+			self.flush()
+
+def pretty_json(obj):
+	parts = []
+	PrettyJSONWriter(parts.append).dump(obj)
+	return "".join(parts)
+
+
+class NotConverted(ValueError):
+	pass
 
 def read_json_file(file_path, try_hyperchoron=True):
-	with open(file_path, "rb") as f:
+	with span("read", file=file_path) as s, open(file_path, "rb") as f:
 		b = f.read()
+		s.set(size=len(b))
 	try:
-		return orjson.loads(b)
+		with span("parse", size=len(b)):
+			return orjson.loads(b)
 	except orjson.JSONDecodeError:
-		if has_hyperchoron and try_hyperchoron:
-			if not os.path.exists(file_path + "~") or not os.path.getsize(file_path + "~"):
+		# UTF-16 or BOM-prefixed sheets are decoded here rather than sent to hyperchoron
+		utf8 = normalize(b)
+		if utf8:
+			try:
+				return orjson.loads(utf8)
+			except orjson.JSONDecodeError:
+				pass
+		if has_hyperchoron():
+			output = converted_path(file_path, b)
+			if not is_converted(output):
+				if not try_hyperchoron:
+					raise NotConverted(f"Not converted yet: {file_path}.")
+				output = get_converter().convert(file_path, b)
+			with open(output, "rb") as f:
 				try:
-					subprocess.run(["hyperchoron", "-i", file_path, "-si", "-f", "skysheet", "-o", file_path + "~"])
-				except FileNotFoundError:
-					raise ValueError(f"Invalid JSON file: {file_path}. If this was a MIDI file, please check out https://github.com/thomas-xin/hyperchoron for conversion!")
-			return read_json_file(file_path + "~", try_hyperchoron=False)
+					return orjson.loads(f.read())
+				except orjson.JSONDecodeError:
+					pass
 		raise ValueError(f"Invalid JSON file: {file_path}.")
 
-def load_song(file_path):
-	data = read_json_file(file_path)
+def open_collection(file_path, try_hyperchoron=True):
+	with span("read", file=file_path) as s, open(file_path, "rb") as f:
+		b = f.read()
+		s.set(size=len(b))
+	# Song spans are byte offsets, so a sheet in another encoding is indexed and read from its UTF-8 copy in memory;
+	# only importing and library scans rewrite the file itself
+	utf8 = normalize(b)
+	try:
+		return SongCollection(file_path, utf8, keep=True) if utf8 else SongCollection(file_path, b)
+	except ValueError:
+		if not has_hyperchoron():
+			raise
+	output = converted_path(file_path, b)
+	if not is_converted(output):
+		if not try_hyperchoron:
+			raise NotConverted(f"Not converted yet: {file_path}.")
+		output = get_converter().convert(file_path, b)
+	return SongCollection(output)
+
+def load_song(file_path, try_hyperchoron=True):
+	data = read_json_file(file_path, try_hyperchoron=try_hyperchoron)
 	if isinstance(data, dict):
 		data = [data]
 	return data
 
-def save_song(data, file_path):
-	s = pretty_json(data)
-	with open(file_path, "w", encoding="utf-8") as f:
-		f.write(s)
+# Written through a temporary file renamed into place, so a failed save never truncates the sheet
+def save_song(data, file_path, compact=False):
+	with span("save", file=file_path, compact=compact), atomic_write(file_path, "w", fsync=True, encoding="utf-8", buffering=1 << 20) as f:
+		if compact:
+			f.write(json_dumpstr(data))
+		else:
+			PrettyJSONWriter(f.write).dump(data)
 	return file_path
 
 def produce_songnotes(song):
-	if not song.get("columns"):
-		if not song.get("bpm"):
-			return
-		bpm_ms = 60000 / song["bpm"]
-		columns = []
-		for note in song["songNotes"]:
-			ts = round(note["time"] / bpm_ms)
-			while len(columns) <= ts:
-				columns.append([1, []])
-			col = columns[ts]
-			col[1].append([int(note["key"].rsplit("Key", 1)[-1]), hex(1 << note.get("l", 1) - 1)[2:].upper()])
-		song["columns"] = columns
-	output = []
-	bpm_ms = 60000 / song["bpm"]
-	timestamp = 100
-	for column in song["columns"]:
-		tempo = 1 / 2 ** column[0]
-		for note in column[1]:
-			layers = int(note[1], 16)
-			count = sum(map(int, bin(layers)[2:]))
-			output.append(dict(
-				key=f"{count}Key{note[0]}",
-				time=round(timestamp),
-			))
-		timestamp += bpm_ms * tempo
-	song["songNotes"] = output
+	with span("produce_songnotes", columns=len(song.get("columns") or ())) as s:
+		if not song.get("columns"):
+			if not song.get("bpm"):
+				return
+			song["columns"] = songnotes_to_columns(song["songNotes"], song["bpm"])
+		song["songNotes"] = columns_to_songnotes(song["columns"], song["bpm"])
+		s.set(notes=len(song["songNotes"]))
+
+# Chord window and retrigger gap (ns) from the playback config, defaulting to the timeline module's
+def timeline_options(playback):
+	return dict(
+		window=round(playback["chord_window_ms"] * 1e6),
+		gap=round(playback["retrigger_gap_ms"] * 1e6),
+	)
+
+# Share of the calibrated key event rate playback may use; the rest is slack for waking up on time
+KEY_RATE_HEADROOM = 0.5
+
+def note_rate(playback):
+	"Notes per second the input path sustains: the lower of the configured and calibrated key rates, halved for key-ups."
+	rates = [rate for rate in (playback["max_key_rate"], playback["calibrated_key_rate"] * KEY_RATE_HEADROOM) if rate]
+	return min(rates) / 2 if rates else 0
+
+def load_timeline(file_path, index=0, song=None, window=CHORD_WINDOW, gap=RETRIGGER_GAP):
+	with span("hash", file=file_path) as s, open(file_path, "rb") as f:
+		b = f.read()
+		key = content_key(b, index, window, gap)
+		s.set(size=len(b))
+	path = cache_path(file_path, key)
+	try:
+		with span("timeline cache") as s:
+			timeline = Timeline.load(path)
+			s.set(chords=len(timeline))
+		return timeline
+	except (OSError, ValueError):
+		pass
+	if song is None:
+		song = open_collection(file_path).song(index)
+	if song.get("columns"):
+		produce_songnotes(song)
+	with span("compile", notes=len(song.get("songNotes") or ())) as s:
+		timeline = compile_song(song, window, gap)
+		s.set(chords=len(timeline), merged=timeline.merged, delayed=timeline.delayed)
+	try:
+		timeline.save(path)
+	except OSError:
+		pass
+	return timeline
+
+
+class PreparedSong:
+	"A compiled timeline plus the plain lists the scheduler plays from, built once per song."
+
+	def __init__(self, file_path, index, timeline, gap=0):
+		self.file_path = file_path
+		self.index = index
+		self.timeline = timeline
+		self.times = timeline.times.tolist()
+		self.masks = timeline.masks.tolist()
+		self.holds = timeline.holds.tolist() if timeline.holds is not None else None
+		self.limits = timeline.release_limits(gap).tolist() if gap else None
+
+def prepare_song(file_path, index, config):
+	with span("prepare_song", file=file_path, index=index) as s:
+		playback = config.read_config()["playback"]
+		options = timeline_options(playback)
+		timeline = load_timeline(file_path, index, **options)
+		with span("limit_density"):
+			timeline = timeline.limit_density(note_rate(playback), playback["density_priority"])
+		with span("scheduler lists", chords=len(timeline)):
+			song = PreparedSong(file_path, index, timeline, options["gap"])
+		s.set(chords=len(timeline), notes=timeline.note_count, thinned=timeline.thinned)
+		return song
+
+# With playback.isolated set, chords are sent from a separate high priority process
+def start_player(config, backend=None):
+	playback = config.read_config()["playback"]
+	if not playback["isolated"]:
+		return None
+	return PlayerProcess(backend=backend or DirectInputBackend.name, affinity=playback["cpu_affinity"])
 
 
 class MusicHandler:
 	exitProgram = False
 	pauseProgram = False
-	data = None
+	timeline = None
 	config = None
 
-	def __init__(self, file_path, config):
+	def __init__(self, file_path, config, backend=None, index=0, playlist=None, hotkeys=None, window=None, player=None):
 		self.started = threading.Condition()
-		self.file_path = file_path
+		self.requested = False
+		self.auto_paused = False
+		self.interrupted = threading.Event()
 		self.config = config
-		self.data = load_song(file_path)
-		if self.data[0].get("columns"):
-			produce_songnotes(self.data[0])
-		self.curr_note = 0
-		self.max_note = 1
-		self.start_key, self.stop_key = self.get_hotkeys()
-		keyboard.add_hotkey(self.stop_key, lambda: self.pause())
+		self.backend = backend or DirectInputBackend()
+		self.backend.bind(config.read_config().note_keys)
+		self.playlist = playlist
+		self.preloader = concurrent.futures.ThreadPoolExecutor(max_workers=1) if playlist else None
+		self.upcoming = None
+		self.cursor = 0
+		self.loop = None
+		self.scheduler = None
+		self.speed = 1.0
+		self.load(prepare_song(file_path, index, config))
+		# Like the hotkeys, the app shares one player process across songs; otherwise the handler starts its own
+		self.owns_player = player is None
+		self.player = start_player(config, self.backend.name) if player is None else player
+		self.telemetry = self.player.view() if self.player else Telemetry()
+		playback = config.read_config()["playback"]
+		self.focus = FocusMonitor(window or PyGetWindowQuery(), playback["focus_poll_ms"] / 1e3)
+		if playback["auto_pause"]:
+			self.focus.subscribe(self.focus_changed)
+		# Without a shared service (app.main creates one), the handler hooks the hotkeys itself and unhooks them on quit
+		self.owns_hotkeys = hotkeys is None
+		self.hotkeys = HotkeyService(config) if hotkeys is None else hotkeys
 		self.running = threading.Thread(target=self.run, daemon=True)
 		self.running.start()
+		self.hotkeys.attach(self)
+
+	def load(self, song):
+		self.song = song
+		self.file_path = song.file_path
+		self.index = song.index
+		self.timeline = song.timeline
+		self.times, self.masks, self.holds, self.limits = song.times, song.masks, song.holds, song.limits
+		self.cursor = 0
+		self.loop = None
+
+	# Compiles the queue's next entry in the background while the current song plays
+	def preload(self):
+		entry = self.playlist.peek() if self.playlist else None
+		if entry and not self.upcoming:
+			self.upcoming = self.preloader.submit(prepare_song, *entry, self.config)
+
+	# Moves to the next playable entry of the queue, skipping ones that fail to load
+	def advance(self):
+		while self.playlist and self.playlist.advance():
+			upcoming, self.upcoming = self.upcoming, None
+			if upcoming is None:
+				upcoming = self.preloader.submit(prepare_song, *self.playlist.current(), self.config)
+			try:
+				song = upcoming.result()
+			except Exception as ex:
+				print(f"Skipping {self.playlist.current()[0]}: {ex}")
+				continue
+			if len(song.timeline):
+				self.load(song)
+				return True
+		return False
 
 	def run(self):
-		notes = self.data[0]['songNotes']
-		threading.Thread(target=self.wait_start).start()
 		while not self.exitProgram:
 			with self.started:
-				self.started.wait()
+				self.started.wait_for(lambda: self.requested or self.exitProgram)
+				self.requested = False
 			if self.exitProgram:
 				break
 			self.pauseProgram = False
-			if gw.getActiveWindowTitle().split(None, 1)[0] == 'Sky':
-				self.simulate_keyboard_presses(notes)
+			if self.focus.check():
+				self.simulate_keyboard_presses()
+		self.focus.stop()
+		self.hotkeys.detach(self)
 
-	def wait_start(self):
-		try:
-			keyboard.wait(self.start_key)
-		except KeyError:
-			pass
+	# Called by the hotkey service when the start hotkey is pressed
+	def start(self):
 		with self.started:
+			self.requested = True
 			self.started.notify_all()
 
-	def get_hotkeys(self):
-		keys = self.config.read_config()["music"]
-		return keys["start_key"]["scan_code"], keys["stop_key"]["scan_code"]
-
 	def is_alive(self):
 		return not self.exitProgram
 
 	def quit(self):
 		self.exitProgram = True
+		self.interrupted.set()
+		if self.scheduler:
+			self.scheduler.stop()
+		self.hotkeys.detach(self)
+		if self.owns_hotkeys:
+			self.hotkeys.close()
+		self.telemetry.set_state(FINISHED)
 		with self.started:
 			self.started.notify_all()
 		self.running.join()
+		if self.preloader:
+			self.preloader.shutdown(wait=False, cancel_futures=True)
+		if self.player and self.owns_player:
+			self.player.close()
 
 	def pause(self):
+		self.auto_paused = False
 		self.pauseProgram = True
-
-	def simulate_keyboard_presses(self, notes):
+		self.interrupted.set()
+		if self.scheduler:
+			self.scheduler.stop()
+
+	# Keys only reach the focused window, so playback pauses when the game loses focus and resumes
+	# from the same chord when it gets it back, unless the stop hotkey paused it in between
+	def focus_changed(self, focused):
+		if not focused and self.telemetry.state == PLAYING and not self.pauseProgram:
+			print("Game window lost focus, pausing")
+			self.pause()
+			self.auto_paused = True
+		elif focused and self.auto_paused and not self.exitProgram:
+			self.auto_paused = False
+			print("Game window focused again, resuming")
+			self.start()
+
+	def index_at(self, position):
+		return int(np.searchsorted(self.timeline.times, position))
+
+	# Moves the cursor to the first chord at or after position (song time in ns), live if playing
+	def seek(self, position):
+		index = min(self.index_at(position), len(self.times))
+		self.cursor = index
+		self.telemetry.position = self.times[index] if index < len(self.times) else self.timeline.duration
+		if self.scheduler and not self.pauseProgram:
+			self.scheduler.seek(index)
+
+	# Repeats the section between two song times (ns); pass None to stop looping
+	def set_loop(self, start, end):
+		if start is None or end is None or start >= end:
+			self.loop = None
+			if self.scheduler:
+				self.scheduler.set_loop(None, None)
+			return
+		self.loop = (self.index_at(start), self.index_at(end))
+		if self.scheduler:
+			self.scheduler.set_loop(*self.loop)
+
+	# Warps playback tempo by speed from the next chord on; the sheet itself is left untouched
+	def set_speed(self, speed):
+		self.speed = speed
+		if self.scheduler:
+			self.scheduler.set_speed(speed)
+
+	def make_scheduler(self, dispatch):
+		options = scheduler_options(self.config.read_config()["playback"])
+		if self.player:
+			return RemoteScheduler(self.player, self.song, speed=self.speed, keys=self.backend.keys, options=options)
+		return Scheduler(dispatch, speed=self.speed, telemetry=self.telemetry, **options)
+
+	def simulate_keyboard_presses(self):
 		if self.exitProgram:
 			return
 		print("Starting playback...")
-		key_mapping = self.config.read_config()["music"]["key_mapping"]
-
-		notes_dict = {}
-		for note in notes:
-			t = note["time"]
-			t /= 1000
-			if t in notes_dict:
-				notes_dict[t].add(key_mapping.get(note['key'][4:]))
-			else:
-				notes_dict[t] = set([key_mapping.get(note['key'][4:])])
-		notes = [(k, "".join(v)) for k, v in notes_dict.items()]
-		if notes:
-			start_time = time.time() - notes[0][0] + 0.25
-
-			self.max_note = round(max(notes_dict))
-			self.curr_note = 0
-
-			def press(k):
-				pydirectinput.keyUp(k)
-				return pydirectinput.keyDown(k)
-			def callback(k):
-				time.sleep(0.04)
-				return pydirectinput.keyUp(k)
-
-			with concurrent.futures.ThreadPoolExecutor(max_workers=64) as exc:
-				for note in notes:
-					next_time = note[0] + start_time
-					delay = next_time - time.time()
-					if delay > 0:
-						time.sleep(delay)
-
-					if self.pauseProgram or self.exitProgram:
-						break
-
-					print(note)
-					key_to_press = note[1]
-					for k in key_to_press:
-						press(k)
-						exc.submit(callback, k)
-					self.curr_note = round(note[0])
+		self.focus.start()
+		with span("bind"):
+			self.backend.bind(self.config.read_config().note_keys)
+		self.interrupted.clear()
+
+		while len(self.timeline):
+			if not self.cursor:
+				self.telemetry.clear()
+			self.telemetry.set_state(PLAYING, self.timeline.duration)
+			self.preload()
+			self.scheduler = self.make_scheduler(self.backend.dispatch)
+			if self.loop:
+				self.scheduler.set_loop(*self.loop)
+			if not (self.pauseProgram or self.exitProgram):
+				self.cursor = self.scheduler.play(self.times, self.masks, start=self.cursor, holds=self.holds, limits=self.limits)
+			if self.pauseProgram and not self.exitProgram and self.cursor < len(self.timeline):
+				self.telemetry.set_state(PAUSED)
+				return
+			self.report_timing()
+			if self.exitProgram or not self.advance():
+				break
+			# The next song is already compiled, so it starts after a fixed gap
+			gap = self.config.read_config()["playback"]["song_gap_ms"]
+			if self.interrupted.wait(gap / 1e3):
+				if not self.exitProgram:
+					self.telemetry.position = 0
+					self.telemetry.set_state(PAUSED, self.timeline.duration)
+				return
+			print(f"Next song: {os.path.basename(self.file_path)}")
+		self.cursor = 0
 		self.exitProgram = True
-
-def mstart(file, config):
-	return MusicHandler(file, config)
\ No newline at end of file
+		self.telemetry.set_state(FINISHED)
+
+	def report_timing(self):
+		stats = self.telemetry.stats()
+		print(f"Played {stats['events']} chords, lateness p50 {stats['p50'] / 1e6:.2f} ms, p99 {stats['p99'] / 1e6:.2f} ms, max {stats['max'] / 1e6:.2f} ms")
+		if self.timeline.merged or self.timeline.delayed:
+			print(f"Merged {self.timeline.merged} notes into nearby chords, delayed {self.timeline.delayed} repeated keys")
+		if self.timeline.thinned:
+			print(f"Left out {self.timeline.thinned} notes to stay within {note_rate(self.config.read_config()['playback']):.0f} notes/s")
+		trace_dir = self.config.read_config()["playback"]["trace_dir"]
+		if trace_dir:
+			os.makedirs(trace_dir, exist_ok=True)
+			name = os.path.basename(self.file_path).rsplit(".", 1)[0]
+			self.telemetry.export(os.path.join(trace_dir, f"{name}-{time.strftime('%Y%m%d-%H%M%S')}.csv"))
+
+def mstart(file, config, backend=None, index=0, playlist=None, hotkeys=None, window=None, player=None):
+	return MusicHandler(file, config, backend=backend, index=index, playlist=playlist, hotkeys=hotkeys, window=window, player=player)
\ No newline at end of file
@@ -0,0 +1,144 @@
+import ctypes
+import time
+import numpy as np
+from music.timeline import NOTE_COUNT, mask_keys
+
+# Input backends receive whole chords as (up, down) key masks, one call per timestamp.
+# bind() maps note indices to key names before playback starts; binding the same keys again is free.
+
+# INPUT.type for keyboard events; pydirectinput passes the bare value rather than naming it
+INPUT_KEYBOARD = 1
+
+
+class InputBackend:
+	name = None
+	injects = False
+	keys = ()
+
+	def bind(self, keys):
+		self.keys = tuple(keys)[:NOTE_COUNT]
+
+	def dispatch(self, up, down, deadline):
+		raise NotImplementedError
+
+	def close(self):
+		pass
+
+
+class DirectInputBackend(InputBackend):
+	"Sends every key of a chord through a single SendInput call."
+
+	name = "direct"
+	injects = True
+	max_cached = 4096
+
+	def __init__(self):
+		import pydirectinput
+		self.di = pydirectinput
+		self.size = ctypes.sizeof(pydirectinput.Input)
+		self.extra = ctypes.c_ulong(0)
+		self.inputs = [(None, None)] * NOTE_COUNT
+		self.chords = {}
+
+	def make_input(self, code, flags):
+		di = self.di
+		if code > 0xFF:
+			code &= 0xFF
+			flags |= di.KEYEVENTF_EXTENDEDKEY
+		ii = di.Input_I()
+		ii.ki = di.KeyBdInput(0, code, flags, 0, ctypes.pointer(self.extra))
+		return di.Input(ctypes.c_ulong(INPUT_KEYBOARD), ii)
+
+	def bind(self, keys):
+		keys = tuple(keys)[:NOTE_COUNT]
+		if keys == self.keys:
+			return
+		super().bind(keys)
+		di = self.di
+		inputs = []
+		for k in self.keys:
+			code = di.KEYBOARD_MAPPING.get(k)
+			if not code:
+				inputs.append((None, None))
+				continue
+			inputs.append((
+				self.make_input(code, di.KEYEVENTF_SCANCODE | di.KEYEVENTF_KEYUP),
+				self.make_input(code, di.KEYEVENTF_SCANCODE),
+			))
+		self.inputs = inputs
+		self.chords.clear()
+
+	def chord(self, up, down):
+		items = [self.inputs[i][0] for i in mask_keys(up) if self.inputs[i][0]]
+		items.extend(self.inputs[i][1] for i in mask_keys(down) if self.inputs[i][1])
+		if len(self.chords) >= self.max_cached:
+			self.chords.clear()
+		chord = self.chords[up, down] = (len(items), (self.di.Input * len(items))(*items))
+		return chord
+
+	def dispatch(self, up, down, deadline):
+		try:
+			n, buffer = self.chords[up, down]
+		except KeyError:
+			n, buffer = self.chord(up, down)
+		if n:
+			self.di.SendInput(n, buffer, self.size)
+
+
+class RecordingBackend(InputBackend):
+	"Injects nothing; stores (scheduled_ns, actual_ns, up, down) per dispatch in preallocated arrays."
+
+	name = "recording"
+
+	def __init__(self, capacity=1 << 16, clock=time.perf_counter_ns):
+		self.clock = clock
+		self.scheduled = np.zeros(capacity, dtype=np.int64)
+		self.actual = np.zeros(capacity, dtype=np.int64)
+		self.ups = np.zeros(capacity, dtype=np.uint16)
+		self.downs = np.zeros(capacity, dtype=np.uint16)
+		self.capacity = capacity
+		self.count = 0
+
+	def dispatch(self, up, down, deadline):
+		i = self.count
+		if i < self.capacity:
+			self.actual[i] = self.clock()
+			self.scheduled[i] = deadline
+			self.ups[i] = up
+			self.downs[i] = down
+		self.count = i + 1
+
+	def clear(self):
+		self.count = 0
+
+	@property
+	def overflowed(self):
+		return max(0, self.count - self.capacity)
+
+	def events(self):
+		n = min(self.count, self.capacity)
+		return self.scheduled[:n], self.actual[:n], self.ups[:n], self.downs[:n]
+
+	def lateness(self, presses_only=True):
+		scheduled, actual, ups, downs = self.events()
+		late = actual - scheduled
+		return late[downs != 0] if presses_only else late
+
+
+def calibrate(backend, duration=200_000_000, clock=time.perf_counter_ns):
+	"Measures the key events per second backend sustains, sending key-ups only so nothing gets pressed."
+	# A backend that injects nothing would report its own bookkeeping speed, which says nothing about the input path
+	if not backend.injects:
+		raise ValueError(f"Cannot calibrate {type(backend).__name__}: it does not inject input")
+	mask = sum(1 << i for i, key in enumerate(backend.keys) if key) or (1 << NOTE_COUNT) - 1
+	size = bin(mask).count("1")
+	calls = 0
+	start = clock()
+	end = start + duration
+	while True:
+		backend.dispatch(mask, 0, 0)
+		calls += 1
+		now = clock()
+		if now >= end:
+			break
+	return calls * size * 1e9 / (now - start)
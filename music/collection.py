@@ -0,0 +1,116 @@
+import re
+import numpy as np
+import orjson
+from music.atomic import atomic_write
+from music.timeline import cache_path, content_key
+from music.tracing import span
+
+# Sheet files may hold one song object or an array of them. A collection indexes the byte span
+# and name of each song once (cached by content hash), then parses only the song that is asked for.
+
+NAME = re.compile(rb'"name"\s*:\s*("(?:[^"\\]|\\.)*")')
+WHITESPACE = b" \t\r\n"
+
+
+def unescaped_quotes(arr):
+	quotes = np.flatnonzero(arr == 0x22)
+	backslashes = np.flatnonzero(arr == 0x5C)
+	if not len(backslashes):
+		return quotes
+	# A backslash escapes the next byte, which may itself be a backslash
+	escaped = []
+	consumed = -1
+	for i in backslashes.tolist():
+		if i > consumed:
+			escaped.append(i + 1)
+			consumed = i + 1
+	return quotes[~np.isin(quotes, escaped)]
+
+def index_songs(b):
+	"Returns (spans, names) for the top-level song objects in b, or None if b is not a JSON object or array."
+	# JSON text never holds a raw NUL, but UTF-16 does, and its brackets and quotes would still be found
+	if b"\0" in b:
+		return None
+	start = len(b) - len(b.lstrip(WHITESPACE))
+	head = b[start:start + 1]
+	if head == b"{":
+		m = NAME.search(b)
+		return [(start, len(b.rstrip(WHITESPACE)))], [orjson.loads(m.group(1)) if m else None]
+	if head != b"[":
+		return None
+	arr = np.frombuffer(b, dtype=np.uint8)
+	quotes = unescaped_quotes(arr)
+	brackets = np.flatnonzero((arr == 0x5B) | (arr == 0x5D) | (arr == 0x7B) | (arr == 0x7D))
+	# Brackets preceded by an odd number of quotes are inside strings
+	brackets = brackets[np.searchsorted(quotes, brackets) & 1 == 0]
+	delta = np.where((arr[brackets] == 0x5B) | (arr[brackets] == 0x7B), 1, -1).astype(np.int32)
+	depth = np.cumsum(delta)
+	if not len(depth) or depth[-1] or depth.min() < 0:
+		return None
+	starts = brackets[(depth == 2) & (delta > 0)]
+	ends = brackets[(depth == 1) & (delta < 0)] + 1
+	if len(starts) != len(ends):
+		return None
+	spans = list(zip(starts.tolist(), ends.tolist()))
+	names = [None] * len(spans)
+	for m in NAME.finditer(b):
+		pos = m.start()
+		i = np.searchsorted(brackets, pos)
+		if not i or depth[i - 1] != 2 or np.searchsorted(quotes, pos) & 1:
+			continue
+		song = np.searchsorted(starts, pos) - 1
+		if song >= 0 and names[song] is None:
+			names[song] = orjson.loads(m.group(1))
+	return spans, names
+
+
+class SongCollection:
+	"Pass keep=True when b is not the file's own bytes (e.g. decoded from another encoding); songs are then cut from b."
+
+	def __init__(self, file_path, b=None, keep=False):
+		self.file_path = file_path
+		self.data = b if keep else None
+		if b is None:
+			with open(file_path, "rb") as f:
+				b = f.read()
+		self.key = content_key(b)
+		path = cache_path(file_path, self.key, "idx")
+		try:
+			with open(path, "rb") as f:
+				index = orjson.loads(f.read())
+			self.spans, self.names = [tuple(span) for span in index["spans"]], index["names"]
+		except (OSError, orjson.JSONDecodeError, KeyError):
+			with span("index songs", size=len(b)):
+				index = index_songs(b)
+			if index is None:
+				raise ValueError(f"Invalid JSON file: {file_path}.")
+			self.spans, self.names = index
+			try:
+				with atomic_write(path) as f:
+					f.write(orjson.dumps(dict(spans=self.spans, names=self.names)))
+			except OSError:
+				pass
+
+	def __len__(self):
+		return len(self.spans)
+
+	def song(self, index=0):
+		start, end = self.spans[index]
+		if self.data is not None:
+			b = self.data[start:end]
+		else:
+			with open(self.file_path, "rb") as f:
+				f.seek(start)
+				b = f.read(end - start)
+		try:
+			with span("parse song", size=len(b), index=index) as s:
+				song = orjson.loads(b)
+				s.set(notes=len(song.get("songNotes") or ()) if isinstance(song, dict) else 0)
+		except orjson.JSONDecodeError:
+			raise ValueError(f"Invalid JSON file: {self.file_path}.")
+		if not isinstance(song, dict):
+			raise ValueError(f"Invalid song {index} in {self.file_path}.")
+		return song
+
+	def titles(self):
+		return [name or f"Song {i + 1}" for i, name in enumerate(self.names)]
@@ -0,0 +1,168 @@
+import concurrent.futures
+import functools
+import os
+import shutil
+import subprocess
+import threading
+import orjson
+from music.timeline import cache_folder, cache_path, content_key
+from music.tracing import span
+
+# Background hyperchoron conversion. Outputs are cached in the song folder's .skycache,
+# keyed by the source content hash and the hyperchoron version, so edits to a source file
+# or a converter upgrade never serve stale sheets.
+
+SUPPORTED = {"txt", "json", "skysheet"}
+
+PENDING = "pending"
+CONVERTING = "converting"
+DONE = "done"
+FAILED = "failed"
+
+
+@functools.lru_cache(maxsize=1)
+def hyperchoron_version():
+	"Identifies the installed converter by its executable's mtime and size; None when it is not installed."
+	exe = shutil.which("hyperchoron")
+	if not exe:
+		return None
+	st = os.stat(exe)
+	return f"{st.st_mtime_ns:x}-{st.st_size:x}"
+
+def has_hyperchoron():
+	return hyperchoron_version() is not None
+
+def probe_formats():
+	try:
+		s = subprocess.check_output(["hyperchoron", "-lf"], encoding="utf-8")
+	except (FileNotFoundError, subprocess.CalledProcessError):
+		return []
+	_, encoders = s.split("# Encoders:\n", 1)
+	encoders, decoders = encoders.split("\n# Decoders:\n", 1)
+	return decoders.splitlines()
+
+# The decoder list is cached on disk and only re-probed when the executable changes
+def load_formats(callback=None, folder="."):
+	version = hyperchoron_version()
+	if not version:
+		return SUPPORTED
+	path = os.path.join(cache_folder(folder), "formats.json")
+	try:
+		with open(path, "rb") as f:
+			cached = orjson.loads(f.read())
+	except (OSError, orjson.JSONDecodeError):
+		cached = {}
+	if cached.get("version") == version:
+		SUPPORTED.update(cached.get("decoders", ()))
+		return SUPPORTED
+
+	def probe():
+		decoders = probe_formats()
+		if not decoders:
+			return
+		try:
+			with open(path, "wb") as f:
+				f.write(orjson.dumps(dict(version=version, decoders=decoders)))
+		except OSError:
+			pass
+		added = set(decoders).difference(SUPPORTED)
+		SUPPORTED.update(decoders)
+		if callback and added:
+			callback(added)
+	threading.Thread(target=probe, daemon=True).start()
+	return SUPPORTED
+
+def converted_path(file_path, b=None):
+	if b is None:
+		with open(file_path, "rb") as f:
+			b = f.read()
+	return cache_path(file_path, content_key(b, "hyperchoron", hyperchoron_version()), "skysheet")
+
+def is_converted(output):
+	try:
+		return os.path.getsize(output) > 0
+	except OSError:
+		return False
+
+def convert_file(file_path, output):
+	tmp = f"{output}.{os.getpid()}.{threading.get_ident()}.skysheet"
+	try:
+		with span("hyperchoron", file=file_path):
+			subprocess.run(["hyperchoron", "-i", file_path, "-si", "-f", "skysheet", "-o", tmp], check=True, stdout=subprocess.DEVNULL)
+	except FileNotFoundError:
+		raise ValueError(f"Invalid JSON file: {file_path}. If this was a MIDI file, please check out https://github.com/thomas-xin/hyperchoron for conversion!")
+	except subprocess.CalledProcessError as ex:
+		raise ValueError(f"Failed to convert {file_path}: hyperchoron exited with {ex.returncode}")
+	if not is_converted(tmp):
+		raise ValueError(f"Failed to convert {file_path}: hyperchoron produced no output")
+	os.replace(tmp, output)
+	return output
+
+
+class Converter:
+	"Runs hyperchoron conversions concurrently; each job is its own hyperchoron process."
+
+	def __init__(self, workers=None):
+		self.pool = concurrent.futures.ThreadPoolExecutor(max_workers=workers or max(1, (os.cpu_count() or 2) - 1))
+		self.lock = threading.Lock()
+		self.jobs = {}
+		self.status = {}
+		self.listeners = []
+
+	def subscribe(self, callback):
+		self.listeners.append(callback)
+
+	def set_status(self, file_path, status):
+		self.status[file_path] = status
+		for callback in self.listeners:
+			callback(file_path, status)
+
+	def submit(self, file_path, b=None):
+		"Queues a conversion unless a current one is cached; returns a future resolving to the converted path."
+		file_path = os.path.abspath(file_path)
+		with self.lock:
+			job = self.jobs.get(file_path)
+			if job and not job.done():
+				return job
+			output = converted_path(file_path, b)
+			if is_converted(output):
+				job = concurrent.futures.Future()
+				job.set_result(output)
+				self.status[file_path] = DONE
+				return job
+			job = self.jobs[file_path] = self.pool.submit(self.run, file_path, output)
+		self.set_status(file_path, PENDING)
+		return job
+
+	def run(self, file_path, output):
+		self.set_status(file_path, CONVERTING)
+		try:
+			convert_file(file_path, output)
+		except Exception:
+			self.set_status(file_path, FAILED)
+			raise
+		self.set_status(file_path, DONE)
+		return output
+
+	def convert(self, file_path, b=None):
+		return self.submit(file_path, b).result()
+
+	def progress(self):
+		with self.lock:
+			status = dict(self.status)
+		done = sum(s in (DONE, FAILED) for s in status.values())
+		return done, len(status), status
+
+	def shutdown(self):
+		self.pool.shutdown(wait=False, cancel_futures=True)
+
+
+converter = None
+converter_lock = threading.Lock()
+
+def get_converter():
+	global converter
+	with converter_lock:
+		if converter is None:
+			converter = Converter()
+	return converter
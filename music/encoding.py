@@ -0,0 +1,95 @@
+import codecs
+import os
+import threading
+import orjson
+from music.atomic import atomic_write
+from music.tracing import span
+
+# Sheets exported by web editors are sometimes UTF-16 or start with a BOM, which orjson rejects.
+# The encoding is told from the BOM, then from the NUL-byte pattern of UTF-16 text, then by strict
+# UTF-8 decoding, and only as a last resort by chardet on a bounded sample. Files that hold JSON in
+# another encoding are rewritten once as plain UTF-8, so later reads take the direct orjson path.
+
+SAMPLE = 1 << 16
+# UTF-32 LE starts with the UTF-16 LE BOM, so it is checked first
+BOMS = (
+	(codecs.BOM_UTF32_LE, "utf-32-le"),
+	(codecs.BOM_UTF32_BE, "utf-32-be"),
+	(codecs.BOM_UTF8, "utf-8"),
+	(codecs.BOM_UTF16_LE, "utf-16-le"),
+	(codecs.BOM_UTF16_BE, "utf-16-be"),
+)
+
+checked = {}
+checked_lock = threading.Lock()
+
+
+def detect_encoding(b):
+	"Returns (encoding, BOM length) for b; encoding is None when it cannot be told."
+	for bom, encoding in BOMS:
+		if b.startswith(bom):
+			return encoding, len(bom)
+	sample = b[:SAMPLE]
+	half = len(sample) // 2
+	if half >= 2:
+		# JSON is mostly ASCII, which UTF-16 stores with a NUL in every other byte
+		even = sample[0::2].count(0)
+		odd = sample[1::2].count(0)
+		if odd > half * 0.4 and even < half * 0.05:
+			return "utf-16-le", 0
+		if even > half * 0.4 and odd < half * 0.05:
+			return "utf-16-be", 0
+	try:
+		codecs.getincrementaldecoder("utf-8")().decode(sample, final=len(sample) == len(b))
+		return "utf-8", 0
+	except UnicodeDecodeError:
+		pass
+	try:
+		import chardet
+	except ImportError:
+		return None, 0
+	return chardet.detect(sample).get("encoding"), 0
+
+def normalize(b):
+	"Returns b as UTF-8 without a BOM if it is text in another encoding, or None if there is nothing to change."
+	encoding, skip = detect_encoding(b)
+	if not encoding or encoding == "utf-8" and not skip:
+		return None
+	try:
+		return b[skip:].decode(encoding).encode("utf-8")
+	except (UnicodeDecodeError, LookupError):
+		return None
+
+def looks_like_utf8_json(b):
+	if b.lstrip()[:1] not in (b"{", b"["):
+		return False
+	return detect_encoding(b) == ("utf-8", 0)
+
+def normalize_file(path):
+	"Rewrites path as UTF-8 if it holds JSON in another encoding; returns the encoding it had, or None if left as is."
+	st = os.stat(path)
+	key = (os.path.abspath(path), st.st_mtime_ns, st.st_size)
+	with checked_lock:
+		if key in checked:
+			return checked[key]
+	with open(path, "rb") as f:
+		b = f.read()
+	encoding = None
+	if not looks_like_utf8_json(b):
+		with span("normalize encoding", file=path, size=len(b)) as s:
+			encoding, _ = detect_encoding(b)
+			utf8 = normalize(b)
+			try:
+				orjson.loads(utf8)
+			except (orjson.JSONDecodeError, TypeError):
+				encoding = None
+			else:
+				with atomic_write(path) as f:
+					f.write(utf8)
+				st = os.stat(path)
+				with checked_lock:
+					checked[(key[0], st.st_mtime_ns, st.st_size)] = None
+			s.set(encoding=encoding)
+	with checked_lock:
+		checked[key] = encoding
+	return encoding
@@ -0,0 +1,90 @@
+import threading
+
+# Watches whether the game window has focus. The active window is polled from a timer thread at a
+# low rate and subscribers hear about changes only, so the dispatcher never calls the window API.
+# Window lookups go through a WindowQuery, so anything other than pygetwindow (a stub on Linux,
+# another window library) can stand in for it.
+
+GAME_TITLE = "Sky"
+
+
+def is_game_window(title):
+	words = title.split(None, 1) if title else ()
+	return bool(words) and words[0] == GAME_TITLE
+
+
+class WindowQuery:
+
+	def active_title(self):
+		"Returns the title of the focused window, or None if it cannot be told."
+		raise NotImplementedError
+
+
+class PyGetWindowQuery(WindowQuery):
+
+	def __init__(self):
+		import pygetwindow
+		self.gw = pygetwindow
+
+	def active_title(self):
+		return self.gw.getActiveWindowTitle()
+
+
+class StaticWindowQuery(WindowQuery):
+	"Reports whatever title was last set; for platforms without a window API and for testing."
+
+	def __init__(self, title=GAME_TITLE):
+		self.title = title
+
+	def active_title(self):
+		return self.title
+
+
+class FocusMonitor:
+
+	def __init__(self, query, interval=0.25):
+		self.query = query
+		self.interval = interval
+		self.focused = None
+		self.subscribers = []
+		self.stopped = threading.Event()
+		self.thread = None
+		self.lock = threading.Lock()
+		self.starting = threading.Lock()
+
+	def subscribe(self, callback):
+		"Calls callback(focused) whenever the game window gains or loses focus, normally from the monitor thread."
+		self.subscribers.append(callback)
+
+	def check(self):
+		"Queries the focused window now; returns whether it is the game's."
+		try:
+			focused = is_game_window(self.query.active_title())
+		except Exception:
+			# Window APIs fail transiently (e.g. while windows are being created), so the last state holds
+			return bool(self.focused)
+		with self.lock:
+			changed, self.focused = self.focused is not None and focused != self.focused, focused
+		if changed:
+			for callback in list(self.subscribers):
+				callback(focused)
+		return focused
+
+	def start(self):
+		with self.starting:
+			if self.thread:
+				return
+			self.stopped.clear()
+			self.thread = threading.Thread(target=self.run, daemon=True)
+			self.thread.start()
+
+	def run(self):
+		while not self.stopped.wait(self.interval):
+			self.check()
+
+	def stop(self):
+		with self.starting:
+			thread, self.thread = self.thread, None
+			self.stopped.set()
+		if thread and thread is not threading.current_thread():
+			thread.join()
@@ -0,0 +1,73 @@
+import threading
+
+# One set of keyboard hooks for the whole session. The start and stop hotkeys are registered once
+# and forward to whichever player is attached, so switching songs only swaps the attached player
+# instead of adding hooks and waiting threads that outlive it.
+
+
+class HotkeyService:
+
+	def __init__(self, config):
+		self.config = config
+		self.lock = threading.Lock()
+		self.engine = None
+		self.handles = ()
+		self.keys = None
+
+	def bind(self):
+		"Registers the configured start and stop hotkeys, replacing the previous ones if they changed."
+		import keyboard
+		music = self.config.read_config()["music"]
+		keys = (music["start_key"]["scan_code"], music["stop_key"]["scan_code"])
+		with self.lock:
+			if keys == self.keys:
+				return
+			self.unbind()
+			self.handles = (
+				keyboard.add_hotkey(keys[0], self.on_start),
+				keyboard.add_hotkey(keys[1], self.on_stop),
+			)
+			self.keys = keys
+
+	def rebind(self):
+		"Picks up hotkeys changed in the config, if they are hooked already."
+		if self.handles:
+			self.bind()
+
+	def unbind(self):
+		import keyboard
+		for handle in self.handles:
+			try:
+				keyboard.remove_hotkey(handle)
+			except (KeyError, ValueError):
+				pass
+		self.handles = ()
+		self.keys = None
+
+	def attach(self, engine):
+		"Sends hotkey presses to engine (start() and pause()) until it detaches or another engine attaches."
+		self.bind()
+		with self.lock:
+			self.engine = engine
+
+	def detach(self, engine):
+		with self.lock:
+			if self.engine is engine:
+				self.engine = None
+
+	# Hotkey callbacks run on the keyboard hook thread, so they only signal the attached engine
+	def on_start(self):
+		engine = self.engine
+		if engine:
+			engine.start()
+
+	def on_stop(self):
+		engine = self.engine
+		if engine:
+			engine.pause()
+
+	def close(self):
+		with self.lock:
+			self.engine = None
+			if self.handles:
+				self.unbind()
@@ -0,0 +1,305 @@
+import multiprocessing
+import os
+import queue
+import sys
+import itertools
+import threading
+import numpy as np
+from multiprocessing import shared_memory
+from music.scheduler import Scheduler, scheduler_options
+from music.telemetry import Telemetry
+
+# Runs the scheduler in its own process, so the GUI, hotkey hooks and preloading never hold the
+# GIL the dispatcher needs. The compiled timeline is handed over in a shared memory block, the
+# telemetry ring and its counters live in another one that the GUI reads directly, and control
+# messages go over a pipe. The player process raises its priority and can be pinned to CPUs; the app
+# keeps one for the whole session. Every play has an id, and a stop names the play it cancels, so a
+# stop sent before the player has started that play still takes effect.
+#   GUI -> player: ("load", block, count, flags) ("play", id, start, speed, loop, keys, options) ("stop", id)
+#                  ("speed", s) ("seek", i) ("loop", a, b) ("quit",)
+#   player -> GUI: ("ready",) ("loaded",) ("stopped", index, played, dropped, max_late)
+
+COUNTERS = 2
+HAS_HOLDS = 1
+HAS_LIMITS = 2
+
+
+class SharedTelemetry(Telemetry):
+	"Telemetry whose ring and counters are views of a shared memory block, written by the player process."
+
+	def __init__(self, block, capacity, max_rate=30):
+		self.counters = np.ndarray(COUNTERS, dtype=np.int64, buffer=block.buf)
+		super().__init__(capacity, max_rate)
+		capacity = self.capacity
+		offset = COUNTERS * 8
+		self.scheduled = np.ndarray(capacity, dtype=np.int64, buffer=block.buf, offset=offset)
+		self.actual = np.ndarray(capacity, dtype=np.int64, buffer=block.buf, offset=offset + capacity * 8)
+		self.masks = np.ndarray(capacity, dtype=np.uint16, buffer=block.buf, offset=offset + capacity * 16)
+		self.block = block
+
+	@staticmethod
+	def size(capacity):
+		capacity = 1 << max(1, capacity - 1).bit_length()
+		return COUNTERS * 8 + capacity * 18
+
+	@property
+	def count(self):
+		return int(self.counters[0])
+
+	@count.setter
+	def count(self, value):
+		self.counters[0] = value
+
+	@property
+	def position(self):
+		return int(self.counters[1])
+
+	@position.setter
+	def position(self, value):
+		self.counters[1] = value
+
+
+def pack_song(song):
+	"Copies a PreparedSong's arrays into a new shared memory block; returns (block, count, flags)."
+	timeline = song.timeline
+	count = len(timeline)
+	flags = (HAS_HOLDS if timeline.holds is not None else 0) | (HAS_LIMITS if song.limits is not None else 0)
+	columns = 1 + bool(flags & HAS_HOLDS) + bool(flags & HAS_LIMITS)
+	block = shared_memory.SharedMemory(create=True, size=max(1, count * (8 * columns + 2)))
+	arrays = unpack_song(block, count, flags)
+	arrays[0][:] = timeline.times
+	arrays[1][:] = timeline.masks
+	if flags & HAS_HOLDS:
+		arrays[2][:] = timeline.holds
+	if flags & HAS_LIMITS:
+		arrays[3][:] = song.limits
+	return block, count, flags
+
+def unpack_song(block, count, flags):
+	"Returns (times, masks, holds, limits) views of a block filled by pack_song."
+	times = np.ndarray(count, dtype=np.int64, buffer=block.buf)
+	offset = count * 8
+	holds = limits = None
+	if flags & HAS_HOLDS:
+		holds = np.ndarray(count, dtype=np.int64, buffer=block.buf, offset=offset)
+		offset += count * 8
+	if flags & HAS_LIMITS:
+		limits = np.ndarray(count, dtype=np.int64, buffer=block.buf, offset=offset)
+		offset += count * 8
+	masks = np.ndarray(count, dtype=np.uint16, buffer=block.buf, offset=offset)
+	return times, masks, holds, limits
+
+
+def raise_priority(affinity=()):
+	"Best effort: high priority class / lower niceness, and CPU pinning when affinity lists CPUs."
+	if sys.platform == "win32":
+		import ctypes
+		kernel32 = ctypes.windll.kernel32
+		process = kernel32.GetCurrentProcess()
+		kernel32.SetPriorityClass(process, 0x80)
+		if affinity:
+			kernel32.SetProcessAffinityMask(process, sum(1 << cpu for cpu in affinity))
+		return
+	try:
+		os.nice(-10)
+	except OSError:
+		pass
+	if affinity and hasattr(os, "sched_setaffinity"):
+		try:
+			os.sched_setaffinity(0, affinity)
+		except OSError:
+			pass
+
+def make_backend(name):
+	"Backends are created by name in the player process, since the parent's cannot be sent over."
+	from music.backend import DirectInputBackend, RecordingBackend
+	if name == RecordingBackend.name:
+		return RecordingBackend(capacity=1 << 20)
+	return DirectInputBackend()
+
+def serve(conn, telemetry_name, capacity, backend, affinity):
+	"Entry point of the player process."
+	raise_priority(affinity)
+	block = shared_memory.SharedMemory(name=telemetry_name)
+	telemetry = SharedTelemetry(block, capacity)
+	backend = make_backend(backend)
+	commands = queue.Queue()
+	current = [None]
+	playing = [0]
+	cancelled = [0]
+
+	# Control messages reach a playing scheduler straight away; everything else waits for the main loop
+	def listen():
+		while True:
+			try:
+				message = conn.recv()
+			except EOFError:
+				message = ("quit",)
+			scheduler = current[0]
+			kind = message[0]
+			if kind == "stop":
+				cancelled[0] = max(cancelled[0], message[1])
+				if scheduler and playing[0] == message[1]:
+					scheduler.stop()
+			elif kind == "speed" and scheduler:
+				scheduler.set_speed(message[1])
+			elif kind == "seek" and scheduler:
+				scheduler.seek(message[1])
+			elif kind == "loop" and scheduler:
+				scheduler.set_loop(message[1], message[2])
+			elif kind in ("load", "play", "quit"):
+				if kind == "quit" and scheduler:
+					scheduler.stop()
+				commands.put(message)
+				if kind == "quit":
+					return
+	threading.Thread(target=listen, daemon=True).start()
+
+	song = None
+	conn.send(("ready",))
+	while True:
+		message = commands.get()
+		if message[0] == "quit":
+			break
+		if message[0] == "load":
+			_, name, count, flags = message
+			shared = shared_memory.SharedMemory(name=name)
+			song = [a.tolist() if a is not None else None for a in unpack_song(shared, count, flags)]
+			shared.close()
+			conn.send(("loaded",))
+			continue
+		_, play_id, start, speed, loop, keys, options = message
+		backend.bind(keys)
+		scheduler = Scheduler(backend.dispatch, speed=speed, telemetry=telemetry, **options)
+		if loop:
+			scheduler.set_loop(*loop)
+		playing[0] = play_id
+		current[0] = scheduler
+		# The listener may have seen the stop before this play had a scheduler
+		if cancelled[0] >= play_id:
+			scheduler.stop()
+		times, masks, holds, limits = song
+		index = scheduler.play(times, masks, start=start, holds=holds, limits=limits)
+		current[0] = None
+		conn.send(("stopped", index, scheduler.played, scheduler.dropped, scheduler.max_late))
+	backend.close()
+	block.close()
+
+
+class PlayerProcess:
+	"Owns the player process; MusicHandler drives it through RemoteScheduler."
+
+	def __init__(self, backend="direct", affinity=(), capacity=1 << 16):
+		context = multiprocessing.get_context("spawn")
+		self.block = shared_memory.SharedMemory(create=True, size=SharedTelemetry.size(capacity))
+		self.capacity = capacity
+		self.telemetry = SharedTelemetry(self.block, capacity)
+		self.conn, child = context.Pipe()
+		self.lock = threading.Lock()
+		self.ids = itertools.count(1)
+		self.song = None
+		self.process = context.Process(
+			target=serve,
+			args=(child, self.block.name, capacity, backend, tuple(affinity)),
+			daemon=True,
+		)
+		self.process.start()
+		child.close()
+		self.expect("ready")
+		self.watcher = threading.Thread(target=self.watch, daemon=True)
+		self.watcher.start()
+
+	def send(self, *message):
+		with self.lock:
+			self.conn.send(message)
+
+	def expect(self, kind):
+		message = self.conn.recv()
+		if message[0] != kind:
+			raise RuntimeError(f"Unexpected message from the player process: {message}")
+		return message
+
+	def view(self):
+		"Returns a new telemetry view of the shared ring for the next song, with its own subscribers and state."
+		self.telemetry = SharedTelemetry(self.block, self.capacity)
+		return self.telemetry
+
+	# The player process writes progress into shared memory; this wakes the newest view's notifier when it moves
+	def watch(self):
+		counters = self.telemetry.counters
+		last = None
+		while self.process.is_alive():
+			current = (int(counters[0]), int(counters[1]))
+			if current != last:
+				last = current
+				self.telemetry.changed.set()
+			self.process.join(self.telemetry.interval)
+
+	def load(self, song):
+		if song is self.song:
+			return
+		block, count, flags = pack_song(song)
+		try:
+			self.send("load", block.name, count, flags)
+			self.expect("loaded")
+		finally:
+			block.close()
+			block.unlink()
+		self.song = song
+
+	def play(self, play_id, start=0, speed=1.0, loop=None, keys=(), options=None):
+		self.send("play", play_id, start, speed, loop, tuple(keys), dict(options or {}))
+		return self.expect("stopped")[1:]
+
+	def close(self):
+		if self.process.is_alive():
+			try:
+				self.send("quit")
+			except (BrokenPipeError, OSError):
+				pass
+			self.process.join(1)
+			if self.process.is_alive():
+				self.process.terminate()
+		self.conn.close()
+		self.block.close()
+		try:
+			self.block.unlink()
+		except FileNotFoundError:
+			pass
+
+
+class RemoteScheduler:
+	"Scheduler stand-in that plays a PreparedSong in the player process."
+
+	def __init__(self, player, song, speed=1.0, keys=(), options=None):
+		self.player = player
+		self.song = song
+		self.speed = speed
+		self.keys = keys
+		self.options = options
+		self.id = next(player.ids)
+		self.loop = None
+		self.index = 0
+		self.played = self.dropped = self.max_late = 0
+
+	def stop(self):
+		self.player.send("stop", self.id)
+
+	def set_speed(self, speed):
+		if speed <= 0:
+			raise ValueError(f"Invalid playback speed: {speed}")
+		self.speed = speed
+		self.player.send("speed", speed)
+
+	def seek(self, index):
+		self.player.send("seek", index)
+
+	def set_loop(self, start, end):
+		self.loop = (start, end) if start is not None and end is not None and start < end else None
+		self.player.send("loop", start, end)
+
+	def play(self, times=None, masks=None, start=0, holds=None, limits=None):
+		"Plays the song from index start in the player process; the arrays are already there."
+		self.player.load(self.song)
+		self.index, self.played, self.dropped, self.max_late = self.player.play(self.id, start, self.speed, self.loop, self.keys, self.options)
+		return self.index
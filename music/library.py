@@ -0,0 +1,186 @@
+import os
+import sqlite3
+import threading
+from music.automusic import open_collection, load_timeline, NotConverted, SUPPORTED
+from music.encoding import normalize_file
+from music.timeline import cache_folder
+
+# Persistent index of the songs folder. A scan only stats the directory and re-parses
+# files whose mtime or size changed; listings and metadata are then served from the index.
+# New files are listed as pending straight away and probed in batches, each committed and
+# reported on its own, so a large first scan fills the list in as it goes.
+
+SCHEMA_VERSION = 2
+COLUMNS = ("file", "mtime", "size", "format", "name", "bpm", "notes", "duration", "songs", "status")
+
+OK = "ok"
+UNCONVERTED = "unconverted"
+PENDING = "pending"
+BATCH = 64
+
+
+class Library:
+
+	def __init__(self, folder):
+		self.folder = folder
+		self.lock = threading.RLock()
+		self.db = None
+		self.scanning = False
+		self.rescan = False
+		if os.path.isdir(folder):
+			self.open()
+
+	def open(self):
+		path = os.path.join(cache_folder(self.folder), "library.db")
+		self.db = sqlite3.connect(path, check_same_thread=False)
+		version = self.db.execute("PRAGMA user_version").fetchone()[0]
+		if version != SCHEMA_VERSION:
+			self.db.execute("DROP TABLE IF EXISTS songs")
+		self.db.execute(
+			"CREATE TABLE IF NOT EXISTS songs (file TEXT PRIMARY KEY, mtime INTEGER, size INTEGER, format TEXT,"
+			" name TEXT, bpm REAL, notes INTEGER, duration REAL, songs INTEGER, status TEXT)"
+		)
+		self.db.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+		self.db.commit()
+
+	def close(self):
+		with self.lock:
+			if self.db:
+				self.db.close()
+				self.db = None
+
+	def listdir(self):
+		try:
+			entries = list(os.scandir(self.folder))
+		except FileNotFoundError:
+			if os.path.relpath(self.folder).startswith(("music/songs", r"music\songs")):
+				os.makedirs(self.folder, exist_ok=True)
+			return {}
+		files = {}
+		for entry in entries:
+			if entry.name.rsplit(".", 1)[-1] in SUPPORTED and entry.is_file():
+				st = entry.stat()
+				files[entry.name] = (st.st_mtime_ns, st.st_size)
+		return files
+
+	def scan(self, progress=None):
+		"Brings the index up to date with the folder, calling progress(names) as rows are committed; returns the names of files that were (re)indexed."
+		# A scan requested while another is running makes that one go over the folder again instead, and returns None
+		with self.lock:
+			if self.scanning:
+				self.rescan = True
+				return None
+			self.scanning = True
+		changed = []
+		try:
+			while True:
+				changed.extend(self.update(progress))
+				with self.lock:
+					if not self.rescan:
+						self.scanning = False
+						return changed
+					self.rescan = False
+		except BaseException:
+			with self.lock:
+				self.scanning = False
+			raise
+
+	def update(self, progress=None):
+		files = self.listdir()
+		with self.lock:
+			if not self.db:
+				if not os.path.isdir(self.folder):
+					return []
+				self.open()
+			known = {row[0]: (row[1], row[2]) for row in self.db.execute("SELECT file, mtime, size FROM songs")}
+		removed = [(name,) for name in known if name not in files]
+		changed = [name for name, stat in files.items() if known.get(name) != stat]
+		# Pending rows have no mtime, so a scan cut short probes them again next time
+		added = [name for name in changed if name not in known]
+		pending = [(name, None, None, name.rsplit(".", 1)[-1].lower(), None, None, None, None, None, PENDING) for name in added]
+		if not self.write(pending, removed):
+			return []
+		if progress and (added or removed):
+			progress(added)
+		for i in range(0, len(changed), BATCH):
+			batch = changed[i:i + BATCH]
+			if not self.write([self.probe(name, *files[name]) for name in batch]):
+				break
+			if progress:
+				progress(batch)
+		return changed
+
+	def write(self, rows, removed=()):
+		"Commits rows and deletions; returns False if the library was closed meanwhile."
+		with self.lock:
+			if not self.db:
+				return False
+			self.db.executemany("DELETE FROM songs WHERE file = ?", removed)
+			self.db.executemany(f"INSERT OR REPLACE INTO songs VALUES ({', '.join('?' * len(COLUMNS))})", rows)
+			self.db.commit()
+		return True
+
+	def refresh(self, name):
+		path = os.path.join(self.folder, name)
+		try:
+			st = os.stat(path)
+		except FileNotFoundError:
+			with self.lock:
+				if self.db:
+					self.db.execute("DELETE FROM songs WHERE file = ?", (name,))
+					self.db.commit()
+			return
+		row = self.probe(name, st.st_mtime_ns, st.st_size)
+		with self.lock:
+			if not self.db:
+				self.open()
+			self.db.execute(f"INSERT OR REPLACE INTO songs VALUES ({', '.join('?' * len(COLUMNS))})", row)
+			self.db.commit()
+
+	def probe(self, name, mtime, size):
+		path = os.path.join(self.folder, name)
+		fmt = name.rsplit(".", 1)[-1].lower()
+		try:
+			if normalize_file(path):
+				st = os.stat(path)
+				mtime, size = st.st_mtime_ns, st.st_size
+			collection = open_collection(path, try_hyperchoron=False)
+			song = collection.song(0)
+			bpm = song.get("bpm")
+			title = song.get("name")
+			timeline = load_timeline(path, 0, song)
+			notes = len(song.get("songNotes") or ())
+		except NotConverted:
+			return (name, mtime, size, fmt, None, None, None, None, None, UNCONVERTED)
+		except Exception as ex:
+			return (name, mtime, size, fmt, None, None, None, None, None, f"{type(ex).__name__}: {ex}")
+		return (name, mtime, size, fmt, title, bpm, notes, timeline.duration / 1e9, len(collection), OK)
+
+	def files(self):
+		with self.lock:
+			if not self.db:
+				return []
+			return [row[0] for row in self.db.execute("SELECT file FROM songs ORDER BY file")]
+
+	def entries(self, names=None):
+		"Returns (file, name, bpm, duration) for every song, or only for the given file names."
+		query = "SELECT file, name, bpm, duration FROM songs"
+		with self.lock:
+			if not self.db:
+				return []
+			if names is None:
+				return self.db.execute(query).fetchall()
+			return [row for name in names for row in self.db.execute(query + " WHERE file = ?", (name,))]
+
+	def with_status(self, status):
+		with self.lock:
+			if not self.db:
+				return []
+			return [row[0] for row in self.db.execute("SELECT file FROM songs WHERE status = ? ORDER BY file", (status,))]
+
+	def get(self, name):
+		with self.lock:
+			if not self.db:
+				return None
+			row = self.db.execute(f"SELECT {', '.join(COLUMNS)} FROM songs WHERE file = ?", (name,)).fetchone()
+		return dict(zip(COLUMNS, row)) if row else None
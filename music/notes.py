@@ -0,0 +1,86 @@
+import numpy as np
+
+# Array-backed conversion between the two sheet layouts:
+#   songNotes: [{"key": "<layer count>Key<note>", "time": <ms>}, ...]
+#   columns: [[<tempo exponent>, [[<note>, "<layer bitmask hex>"], ...]], ...], one column per beat
+# Timestamps are accumulated in the same order as the original loops, so outputs match them exactly.
+
+START_TIME = 100
+
+key_cache = {}
+layer_cache = {}
+
+
+def note_key(key):
+	try:
+		return key_cache[key]
+	except KeyError:
+		pass
+	note = key_cache[key] = int(key.rsplit("Key", 1)[-1])
+	return note
+
+def layer_mask(layers):
+	try:
+		return layer_cache[layers]
+	except KeyError:
+		pass
+	mask = layer_cache[layers] = int(layers, 16)
+	return mask
+
+def popcount(a):
+	a = a.astype(np.uint64)
+	a = a - (a >> np.uint64(1) & np.uint64(0x5555555555555555))
+	a = (a & np.uint64(0x3333333333333333)) + (a >> np.uint64(2) & np.uint64(0x3333333333333333))
+	a = a + (a >> np.uint64(4)) & np.uint64(0x0F0F0F0F0F0F0F0F)
+	return (a * np.uint64(0x0101010101010101) >> np.uint64(56)).astype(np.int64)
+
+
+def songnotes_to_columns(notes, bpm):
+	bpm_ms = 60000 / bpm
+	n = len(notes)
+	times = np.fromiter((note["time"] for note in notes), dtype=np.float64, count=n)
+	beats = np.rint(times / bpm_ms).astype(np.int64)
+	layers = np.fromiter((note.get("l", 1) for note in notes), dtype=np.int64, count=n)
+	hexes = {l: hex(1 << l - 1)[2:].upper() for l in np.unique(layers).tolist()}
+	columns = [[1, []] for _ in range(int(beats.max()) + 1 if n else 0)]
+	for beat, note, l in zip(beats.tolist(), notes, layers.tolist()):
+		columns[beat][1].append([note_key(note["key"]), hexes[l]])
+	return columns
+
+def column_times(columns, bpm):
+	"Returns the per-note timestamps for columns, flattened in column order."
+	bpm_ms = 60000 / bpm
+	tempos = np.fromiter((column[0] for column in columns), dtype=np.float64, count=len(columns))
+	counts = np.fromiter((len(column[1]) for column in columns), dtype=np.int64, count=len(columns))
+	steps = bpm_ms * (1 / np.power(2.0, tempos))
+	starts = np.cumsum(np.concatenate(([float(START_TIME)], steps[:-1]))) if len(columns) else steps
+	return np.rint(np.repeat(starts, counts)).astype(np.int64)
+
+def columns_to_songnotes(columns, bpm):
+	times = column_times(columns, bpm).tolist()
+	cells = [note for column in columns for note in column[1]]
+	counts = popcount(np.fromiter((layer_mask(note[1]) for note in cells), dtype=np.uint64, count=len(cells))).tolist()
+	names = {}
+	for note, count in zip(cells, counts):
+		if (count, note[0]) not in names:
+			names[count, note[0]] = f"{count}Key{note[0]}"
+	return [{"key": names[count, note[0]], "time": t} for note, count, t in zip(cells, counts, times)]
+
+def retime(song, bpm):
+	"Moves every note of song to a new bpm in place, keeping the existing note objects."
+	old = song.get("bpm") or bpm
+	song["bpm"] = bpm
+	notes = song.get("songNotes")
+	if not song.get("columns"):
+		# Without columns there is no beat grid, so each note's time is scaled and nothing gets snapped together
+		scale = old / bpm
+		for note in notes or ():
+			note["time"] = round(note["time"] * scale)
+		return song
+	times = column_times(song["columns"], bpm)
+	if not notes or len(notes) != len(times):
+		song["songNotes"] = columns_to_songnotes(song["columns"], bpm)
+		return song
+	for note, t in zip(notes, times.tolist()):
+		note["time"] = t
+	return song
@@ -0,0 +1,52 @@
+import random
+
+# Play queue of (file_path, song index) entries. The entry at the current position is the one
+# playing; peek() tells the player what to preload and advance() moves on once it is due.
+
+SEQUENTIAL = "sequential"
+SHUFFLE = "shuffle"
+REPEAT = "repeat"
+MODES = (SEQUENTIAL, SHUFFLE, REPEAT)
+
+
+class Playlist:
+
+	def __init__(self, entries=(), mode=SEQUENTIAL, rng=None):
+		if mode not in MODES:
+			raise ValueError(f"Unknown playlist mode: {mode}")
+		self.entries = list(entries)
+		self.mode = mode
+		self.rng = rng or random.Random()
+		self.position = 0
+		self.order = list(range(len(self.entries)))
+		if mode == SHUFFLE:
+			# The first entry is the song that was selected; the rest follow in random order
+			rest = self.order[1:]
+			self.rng.shuffle(rest)
+			self.order[1:] = rest
+
+	def __len__(self):
+		return len(self.entries)
+
+	def current(self):
+		return self.entries[self.order[self.position]] if self.entries else None
+
+	def next_position(self):
+		position = self.position + 1
+		if position >= len(self.entries):
+			if self.mode != REPEAT or not self.entries:
+				return None
+			position = 0
+		return position
+
+	def peek(self):
+		"Returns the entry after the current one without moving, or None at the end of the queue."
+		position = self.next_position()
+		return None if position is None else self.entries[self.order[position]]
+
+	def advance(self):
+		position = self.next_position()
+		if position is None:
+			return None
+		self.position = position
+		return self.entries[self.order[position]]
@@ -0,0 +1,209 @@
+import heapq
+import threading
+import time
+
+# Chord dispatcher with absolute deadlines against the song start.
+# Waits sleep until the deadline is within spin_threshold, then spin for the remainder.
+# Key releases share the same thread: each press schedules a release on a heap, and releases
+# that fall due by the next press are sent together with it in a single dispatch(up, down, deadline).
+# Song time maps to clock time through an anchor and a speed factor; changing the speed re-anchors
+# at the current song position, so tempo changes apply from the next chord without a jump.
+# Seeks and A-B loops move the chord index and re-anchor in the same way.
+# Optional release limits (song time per chord) cut holds short so a key is up before its next press.
+
+CATCH_UP = "catchup"
+DROP = "drop"
+POLICIES = (CATCH_UP, DROP)
+
+
+def scheduler_options(playback):
+	"Scheduler keyword arguments from the playback section of the config."
+	return dict(
+		spin_threshold=round(playback["spin_threshold_ms"] * 1e6),
+		policy=playback["late_policy"],
+		drop_late=round(playback["drop_late_ms"] * 1e6),
+		hold=round(playback["hold_ms"] * 1e6),
+	)
+
+
+class Scheduler:
+
+	def __init__(self, dispatch, spin_threshold=2_000_000, policy=CATCH_UP, drop_late=150_000_000, lead_in=250_000_000, hold=40_000_000, speed=1.0, telemetry=None, clock=time.perf_counter_ns):
+		if policy not in POLICIES:
+			raise ValueError(f"Unknown late policy: {policy}")
+		self.dispatch = dispatch
+		self.spin_threshold = spin_threshold
+		self.policy = policy
+		self.drop_late = drop_late
+		self.lead_in = lead_in
+		self.hold = hold
+		self.telemetry = telemetry
+		self.clock = clock
+		self.stopped = threading.Event()
+		self.wake = threading.Event()
+		self.speed = self.next_speed = speed
+		self.anchor = 0
+		self.anchor_time = 0
+		self.index = 0
+		self.next_index = None
+		self.loop = None
+		self.held = 0
+		self.reset_stats()
+
+	def reset_stats(self):
+		self.played = 0
+		self.dropped = 0
+		self.max_late = 0
+		self.total_late = 0
+
+	def stop(self):
+		self.stopped.set()
+		self.wake.set()
+
+	def set_speed(self, speed):
+		if speed <= 0:
+			raise ValueError(f"Invalid playback speed: {speed}")
+		self.next_speed = speed
+		self.wake.set()
+
+	def seek(self, index):
+		"Continues playback from chord index, from the next wake-up on."
+		self.next_index = index
+		self.wake.set()
+
+	def set_loop(self, start, end):
+		"Repeats chords [start, end) until cleared with set_loop(None, None)."
+		self.loop = (start, end) if start is not None and end is not None and start < end else None
+
+	def song_time(self, ns):
+		"Maps a clock time to a position in song time."
+		return self.anchor_time + round((ns - self.anchor) * self.speed)
+
+	def deadline(self, t):
+		return self.anchor + round((t - self.anchor_time) / self.speed)
+
+	def reanchor(self):
+		now = self.clock()
+		if now > self.anchor:
+			self.anchor_time = self.song_time(now)
+			self.anchor = now
+		self.speed = self.next_speed
+
+	def wait_until(self, deadline):
+		"Returns True once deadline is reached, or False early if woken by stop() or set_speed()."
+		clock = self.clock
+		remaining = deadline - clock()
+		if remaining > self.spin_threshold:
+			if self.wake.wait((remaining - self.spin_threshold) / 1e9):
+				return False
+		while clock() < deadline:
+			pass
+		return not self.wake.is_set()
+
+	def release_all(self):
+		if self.held:
+			self.dispatch(self.held, 0, self.clock())
+			self.held = 0
+
+	def play(self, times, masks, start=0, holds=None, limits=None):
+		"Plays chords from index start; returns the index of the first chord not played."
+		times = times.tolist() if hasattr(times, "tolist") else times
+		masks = masks.tolist() if hasattr(masks, "tolist") else masks
+		holds = holds.tolist() if hasattr(holds, "tolist") else holds
+		limits = limits.tolist() if hasattr(limits, "tolist") else limits
+		if start >= len(times):
+			return start
+		clock = self.clock
+		dispatch = self.dispatch
+		drop = self.policy == DROP
+		hold = self.hold
+		record = self.telemetry.record if self.telemetry else None
+		self.wake.clear()
+		if self.stopped.is_set():
+			return start
+		self.speed = self.next_speed
+		self.anchor = clock() + self.lead_in
+		self.anchor_time = times[start]
+		release_at = [0] * 16
+		releases = []
+
+		def due(deadline):
+			# Keys whose most recent press has expired by deadline; retriggered keys stay held
+			up = 0
+			while releases and releases[0][0] <= deadline:
+				t, mask = heapq.heappop(releases)
+				k = 0
+				while mask:
+					if mask & 1 and release_at[k] <= t:
+						up |= 1 << k
+					mask >>= 1
+					k += 1
+			return up & self.held
+
+		i = start
+		n = len(times)
+		try:
+			while True:
+				if self.wake.is_set():
+					if self.stopped.is_set():
+						self.index = i
+						return i
+					self.wake.clear()
+					self.reanchor()
+					if self.next_index is not None:
+						i, self.next_index = min(max(0, self.next_index), n), None
+						self.release_all()
+						releases.clear()
+						if i < n:
+							self.anchor = clock()
+							self.anchor_time = times[i]
+				if self.loop and i >= self.loop[1] and self.loop[0] < n:
+					start, end = self.loop
+					self.anchor = self.deadline(times[end]) if end < n else max(clock(), self.anchor)
+					self.anchor_time = times[start]
+					i = start
+				if i >= n and not releases:
+					break
+				self.index = i
+				press = self.deadline(times[i]) if i < n else None
+				if releases and (press is None or releases[0][0] < press):
+					deadline = releases[0][0]
+					if not self.wait_until(deadline):
+						continue
+					up = due(deadline)
+					if up:
+						dispatch(up, 0, deadline)
+						self.held &= ~up
+					continue
+				if not self.wait_until(press):
+					continue
+				late = clock() - press
+				down = masks[i]
+				i += 1
+				if drop and late > self.drop_late:
+					self.dropped += 1
+					continue
+				up = due(press) | down & self.held
+				dispatch(up, down, press)
+				if record:
+					record(press, press + late, down, times[i - 1])
+				self.held = self.held & ~up | down
+				release = press + (holds[i - 1] if holds and holds[i - 1] else hold)
+				if limits:
+					release = min(release, max(self.deadline(limits[i - 1]), press))
+				mask = down
+				k = 0
+				while mask:
+					if mask & 1:
+						release_at[k] = release
+					mask >>= 1
+					k += 1
+				heapq.heappush(releases, (release, down))
+				self.played += 1
+				self.total_late += late
+				if late > self.max_late:
+					self.max_late = late
+			self.index = i
+			return i
+		finally:
+			self.release_all()
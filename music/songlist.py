@@ -0,0 +1,94 @@
+# In-memory index behind the song list: filtering and sorting never touch the folder or the
+# library database. Each sort order is computed once and reused until an entry changes, and a
+# query that extends the previous one only re-checks the songs that matched before.
+
+SORT_KEYS = ("name", "bpm", "duration")
+
+
+def sort_key(field):
+	if field == "name":
+		return lambda entry: entry[0].lower()
+	i = SORT_KEYS.index(field) + 1
+	# Songs without a bpm or duration (unconverted, broken) go last
+	return lambda entry: (entry[i] is None, entry[i] or 0, entry[0].lower())
+
+
+class SongIndex:
+
+	def __init__(self):
+		self.entries = {}
+		self.texts = {}
+		self.orders = {}
+		self.query = None
+		self.matches = None
+
+	def __len__(self):
+		return len(self.entries)
+
+	def __contains__(self, name):
+		return name in self.entries
+
+	def update(self, rows):
+		"Adds or replaces (file, title, bpm, duration) rows; returns the names that changed."
+		changed = []
+		for row in rows:
+			row = tuple(row)
+			if self.entries.get(row[0]) != row:
+				self.entries[row[0]] = row
+				self.texts[row[0]] = " ".join(str(x) for x in row[:2] if x).lower()
+				changed.append(row[0])
+		if changed:
+			self.invalidate()
+		return changed
+
+	def remove(self, names):
+		removed = [name for name in names if self.entries.pop(name, None)]
+		for name in removed:
+			del self.texts[name]
+		if removed:
+			self.invalidate()
+		return removed
+
+	def sync(self, names, rows):
+		"Keeps only the given names and updates the given rows; returns (changed, removed) names."
+		keep = set(names)
+		return self.update(rows), self.remove([name for name in self.entries if name not in keep])
+
+	def invalidate(self):
+		self.orders.clear()
+		self.query = self.matches = None
+
+	def search(self, query):
+		"Returns the set of names whose file name or title contains every word of query."
+		query = " ".join(query.lower().split())
+		if query == self.query:
+			return self.matches
+		words = query.split()
+		# Typing more narrows the previous result, so only its members are checked again
+		if self.query is not None and query.startswith(self.query):
+			candidates = self.matches
+		else:
+			candidates = self.entries
+		texts = self.texts
+		self.matches = {name for name in candidates if all(word in texts[name] for word in words)}
+		self.query = query
+		return self.matches
+
+	def order(self, field="name"):
+		try:
+			return self.orders[field]
+		except KeyError:
+			pass
+		names = self.orders[field] = [entry[0] for entry in sorted(self.entries.values(), key=sort_key(field))]
+		return names
+
+	def view(self, query="", field="name", reverse=False):
+		"Returns the names matching query, sorted by field."
+		names = self.order(field)
+		if query.strip():
+			matches = self.search(query)
+			names = [name for name in names if name in matches]
+		return names[::-1] if reverse else list(names)
+
+	def get(self, name):
+		return self.entries.get(name)
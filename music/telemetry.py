@@ -0,0 +1,119 @@
+import threading
+import time
+import numpy as np
+from music.notes import popcount
+
+# Playback telemetry. The dispatcher is the only writer: it fills a preallocated ring of
+# (scheduled, actual, chord mask) without locking, and readers take snapshots of it.
+# Progress is pushed to subscribers from a notifier thread, at most max_rate times per second.
+
+LATENESS_BINS = np.array([-np.inf, 0, 100e3, 250e3, 500e3, 1e6, 2e6, 5e6, 10e6, 20e6, 50e6, 100e6, np.inf])
+
+PLAYING = "playing"
+PAUSED = "paused"
+FINISHED = "finished"
+
+
+class Telemetry:
+
+	def __init__(self, capacity=1 << 16, max_rate=30):
+		capacity = 1 << max(1, capacity - 1).bit_length()
+		self.scheduled = np.zeros(capacity, dtype=np.int64)
+		self.actual = np.zeros(capacity, dtype=np.int64)
+		self.masks = np.zeros(capacity, dtype=np.uint16)
+		self.capacity = capacity
+		self.wrap = capacity - 1
+		self.count = 0
+		self.position = 0
+		self.duration = 0
+		self.state = FINISHED
+		self.interval = 1 / max_rate
+		self.changed = threading.Event()
+		self.subscribers = []
+		self.notifier = None
+		self.lock = threading.Lock()
+
+	def record(self, scheduled, actual, mask, position):
+		i = self.count & self.wrap
+		self.scheduled[i] = scheduled
+		self.actual[i] = actual
+		self.masks[i] = mask
+		self.count += 1
+		self.position = position
+		if not self.changed.is_set():
+			self.changed.set()
+
+	def clear(self):
+		self.count = 0
+
+	def snapshot(self, last=None):
+		"Returns (scheduled, actual, masks) for the most recent events, oldest first."
+		count = self.count
+		n = min(count, self.capacity, last or self.capacity)
+		idx = np.arange(count - n, count) & self.wrap
+		return self.scheduled[idx], self.actual[idx], self.masks[idx]
+
+	def lateness(self, last=None):
+		scheduled, actual, _ = self.snapshot(last)
+		return actual - scheduled
+
+	def stats(self, last=None):
+		late = self.lateness(last)
+		if not len(late):
+			return dict(events=0, p50=0, p99=0, max=0)
+		p50, p99 = np.percentile(late, [50, 99])
+		return dict(events=len(late), p50=int(p50), p99=int(p99), max=int(late.max()))
+
+	def histogram(self, last=None):
+		counts, _ = np.histogram(self.lateness(last), bins=LATENESS_BINS)
+		return counts
+
+	def export(self, path):
+		scheduled, actual, masks = self.snapshot()
+		sizes = popcount(masks)
+		with open(path, "w", encoding="utf-8") as f:
+			f.write("scheduled_ns,actual_ns,late_ns,keys,chord_size\n")
+			for row in zip(scheduled.tolist(), actual.tolist(), (actual - scheduled).tolist(), masks.tolist(), sizes.tolist()):
+				f.write(",".join(map(str, row)) + "\n")
+		return path
+
+	def subscribe(self, callback):
+		"Calls callback(position_ns, duration_ns, state) whenever progress or state changes."
+		self.subscribers.append(callback)
+		if self.state != FINISHED:
+			self.start_notifier()
+
+	def unsubscribe(self, callback):
+		try:
+			self.subscribers.remove(callback)
+		except ValueError:
+			pass
+
+	def start_notifier(self):
+		with self.lock:
+			if self.subscribers and not self.notifier:
+				self.notifier = threading.Thread(target=self.notify, daemon=True)
+				self.notifier.start()
+
+	def set_state(self, state, duration=None):
+		if duration is not None:
+			self.duration = duration
+		self.state = state
+		self.changed.set()
+		if state != FINISHED:
+			self.start_notifier()
+
+	# Runs while a song is playing and exits once the finished state has been delivered
+	def notify(self):
+		while True:
+			self.changed.wait()
+			self.changed.clear()
+			state = self.state
+			for callback in list(self.subscribers):
+				callback(self.position, self.duration, state)
+			if state == FINISHED:
+				with self.lock:
+					if self.state == FINISHED:
+						self.notifier = None
+						return
+			time.sleep(self.interval)
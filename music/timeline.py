@@ -0,0 +1,225 @@
+import hashlib
+import os
+import numpy as np
+from music.atomic import atomic_write
+
+# Compiled playback timelines: one int64 nanosecond offset and one 15-bit key mask per chord,
+# plus optional int64 hold durations when the sheet specifies note durations.
+# Cached as "<magic><header counts><times...>[holds...]<masks...>" and memory-mapped on load.
+# Notes less than a chord window apart are merged into one chord, and a key pressed again within
+# the retrigger gap of its previous press is delayed until the gap has passed.
+# A density limit can then thin chords to what the input path sustains, keeping keys by priority.
+
+NOTE_COUNT = 15
+CACHE_DIR = ".skycache"
+MAGIC = b"SKYTL\x00\x00\x03"
+HEADER = np.dtype([("magic", "S8"), ("count", "<i8"), ("dropped", "<i8"), ("flags", "<i8"), ("merged", "<i8"), ("delayed", "<i8")])
+HAS_HOLDS = 1
+CHORD_WINDOW = 3_000_000
+RETRIGGER_GAP = 10_000_000
+NEVER = np.iinfo(np.int64).max
+PRIORITIES = ("top", "bottom", "outer")
+
+
+def note_index(key):
+	try:
+		return int(key.rsplit("Key", 1)[-1])
+	except (AttributeError, ValueError):
+		return -1
+
+def mask_keys(mask):
+	return [i for i in range(NOTE_COUNT) if mask >> i & 1]
+
+def priority_keys(mask, priority="top"):
+	"Keys of mask in the order they are kept when thinning: highest first, lowest first, or alternating from the outside in."
+	keys = mask_keys(mask)
+	if priority == "top":
+		keys.reverse()
+	elif priority == "outer":
+		keys = [keys[-1 - i // 2] if i % 2 == 0 else keys[i // 2] for i in range(len(keys))]
+	return keys
+
+
+class Timeline:
+
+	def __init__(self, times, masks, dropped=0, holds=None, merged=0, delayed=0, thinned=0):
+		self.times = times
+		self.masks = masks
+		self.dropped = dropped
+		self.holds = holds
+		self.merged = merged
+		self.delayed = delayed
+		self.thinned = thinned
+
+	def __len__(self):
+		return len(self.times)
+
+	@property
+	def duration(self):
+		return int(self.times[-1]) if len(self.times) else 0
+
+	@property
+	def note_count(self):
+		masks = self.masks.astype(np.uint32)
+		count = np.zeros(len(masks), dtype=np.uint32)
+		for i in range(NOTE_COUNT):
+			count += masks >> i & 1
+		return int(count.sum())
+
+	def release_limits(self, gap=RETRIGGER_GAP):
+		"Latest song time each chord's keys may stay down, so they are up gap // 2 (or halfway, if closer) before being pressed again."
+		times = np.asarray(self.times)
+		masks = np.asarray(self.masks)
+		limits = np.full(len(times), NEVER, dtype=np.int64)
+		for i in range(NOTE_COUNT):
+			presses = np.flatnonzero(masks >> i & 1)
+			if len(presses) > 1:
+				current = presses[:-1]
+				following = times[presses[1:]]
+				limit = np.maximum(following - gap // 2, times[current] + (following - times[current]) // 2)
+				limits[current] = np.minimum(limits[current], limit)
+		return limits
+
+	def limit_density(self, rate, priority="top", burst=250_000_000):
+		"Thins chords so at most rate notes per second (with burst ns of slack) are pressed; returns a new Timeline."
+		if priority not in PRIORITIES:
+			raise ValueError(f"Unknown density priority: {priority}")
+		if not rate or not len(self.times):
+			return self
+		times = np.asarray(self.times)
+		capacity = max(1.0, rate * burst / 1e9)
+		tokens = capacity
+		last = 0
+		thinned = 0
+		masks = []
+		for t, mask in zip(times.tolist(), self.masks.tolist()):
+			tokens = min(capacity, tokens + (t - last) * rate / 1e9)
+			last = t
+			size = bin(mask).count("1")
+			if size > tokens:
+				keep = int(tokens)
+				thinned += size - keep
+				size = keep
+				mask = sum(1 << k for k in priority_keys(mask, priority)[:keep])
+			tokens -= size
+			masks.append(mask)
+		if not thinned:
+			return self
+		masks = np.array(masks, dtype=np.uint16)
+		kept = masks != 0
+		holds = np.asarray(self.holds)[kept] if self.holds is not None else None
+		return Timeline(times[kept], masks[kept], self.dropped, holds, self.merged, self.delayed, thinned)
+
+	def save(self, path):
+		flags = HAS_HOLDS if self.holds is not None else 0
+		header = np.array([(MAGIC, len(self.times), self.dropped, flags, self.merged, self.delayed)], dtype=HEADER)
+		with atomic_write(path) as f:
+			f.write(header.tobytes())
+			f.write(np.ascontiguousarray(self.times, dtype="<i8").tobytes())
+			if flags & HAS_HOLDS:
+				f.write(np.ascontiguousarray(self.holds, dtype="<i8").tobytes())
+			f.write(np.ascontiguousarray(self.masks, dtype="<u2").tobytes())
+		return path
+
+	@classmethod
+	def load(cls, path):
+		header = np.fromfile(path, dtype=HEADER, count=1)
+		if not len(header) or header["magic"][0] != MAGIC:
+			raise ValueError(f"Invalid timeline cache: {path}")
+		count = int(header["count"][0])
+		dropped = int(header["dropped"][0])
+		merged = int(header["merged"][0])
+		delayed = int(header["delayed"][0])
+		columns = 2 if header["flags"][0] & HAS_HOLDS else 1
+		if os.path.getsize(path) != HEADER.itemsize + count * (8 * columns + 2):
+			raise ValueError(f"Truncated timeline cache: {path}")
+		if not count:
+			return cls(np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.uint16), dropped, merged=merged, delayed=delayed)
+		offset = HEADER.itemsize
+		times = np.memmap(path, dtype="<i8", mode="r", offset=offset, shape=(count,))
+		holds = None
+		if columns > 1:
+			offset += count * 8
+			holds = np.memmap(path, dtype="<i8", mode="r", offset=offset, shape=(count,))
+		masks = np.memmap(path, dtype="<u2", mode="r", offset=offset + count * 8, shape=(count,))
+		return cls(times, masks, dropped, holds, merged, delayed)
+
+
+def coalesce(ns, keys, durations=None, window=CHORD_WINDOW, gap=RETRIGGER_GAP):
+	"Groups time-sorted notes into chords; returns (times, masks, holds, merged, delayed)."
+	last = [-NEVER] * NOTE_COUNT
+	chords = {}
+	merged = delayed = 0
+	start = -NEVER
+	for i, (t, k) in enumerate(zip(ns.tolist(), keys.tolist())):
+		if last[k] == start and abs(t - start) <= window:
+			# Repeats a key of the open chord; absorbed like notes at identical times
+			merged += t != start
+			t = start
+		elif t < last[k] + gap:
+			t = last[k] + gap
+			delayed += 1
+		if t != start:
+			if abs(t - start) <= window and start >= last[k] + gap:
+				merged += 1
+				t = start
+			else:
+				start = t
+		chord = chords.get(t)
+		if chord is None:
+			chord = chords[t] = [0, 0]
+		chord[0] |= 1 << k
+		if durations is not None and durations[i] > chord[1]:
+			chord[1] = durations[i]
+		last[k] = t
+	times = np.fromiter(chords, dtype=np.int64, count=len(chords))
+	order = np.argsort(times, kind="stable")
+	values = np.array(list(chords.values()), dtype=np.int64).reshape(-1, 2)[order]
+	holds = values[:, 1] if durations is not None else None
+	return times[order], values[:, 0].astype(np.uint16), holds, merged, delayed
+
+def compile_song(song, window=0, gap=0):
+	"Compiles a song into a Timeline; window and gap (ns) enable chord coalescing and retrigger spacing."
+	notes = song.get("songNotes") or ()
+	times = np.fromiter((note["time"] for note in notes), dtype=np.float64, count=len(notes))
+	keys = np.fromiter((note_index(note["key"]) for note in notes), dtype=np.int64, count=len(notes))
+	durations = None
+	if any("duration" in note for note in notes):
+		durations = np.fromiter((note.get("duration") or 0 for note in notes), dtype=np.float64, count=len(notes))
+	valid = (keys >= 0) & (keys < NOTE_COUNT)
+	dropped = int(len(keys) - np.count_nonzero(valid))
+	times, keys = times[valid], keys[valid]
+	if not len(times):
+		return Timeline(np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.uint16), dropped)
+	ns = np.round(times * 1e6).astype(np.int64)
+	if durations is not None:
+		# A chord is held for its longest note; 0 falls back to the player's default hold
+		durations = np.round(durations[valid] * 1e6).astype(np.int64)
+	if window > 0 or gap > 0:
+		order = np.argsort(ns, kind="stable")
+		chords, masks, holds, merged, delayed = coalesce(ns[order], keys[order], durations[order].tolist() if durations is not None else None, window, gap)
+		return Timeline(chords - chords[0], masks, dropped, holds, merged, delayed)
+	chords, inverse = np.unique(ns, return_inverse=True)
+	masks = np.zeros(len(chords), dtype=np.uint16)
+	np.bitwise_or.at(masks, inverse, (1 << keys).astype(np.uint16))
+	holds = None
+	if durations is not None:
+		holds = np.zeros(len(chords), dtype=np.int64)
+		np.maximum.at(holds, inverse, durations)
+	return Timeline(chords - chords[0], masks, dropped, holds)
+
+
+def content_key(b, *params):
+	h = hashlib.blake2b(b, digest_size=16)
+	h.update(MAGIC)
+	for p in params:
+		h.update(repr(p).encode("utf-8"))
+	return h.hexdigest()
+
+def cache_folder(folder):
+	folder = os.path.join(os.path.abspath(folder), CACHE_DIR)
+	os.makedirs(folder, exist_ok=True)
+	return folder
+
+def cache_path(file_path, key, ext="tl"):
+	return os.path.join(cache_folder(os.path.dirname(os.path.abspath(file_path))), f"{key}.{ext}")
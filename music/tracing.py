@@ -0,0 +1,120 @@
+import atexit
+import cProfile
+import os
+import threading
+import time
+import orjson
+
+# Opt-in timing spans for the song loading pipeline. Off by default: span() then returns a shared
+# no-op object, so instrumented code pays one function call and a flag check.
+# Turn on with SKYMUSIC_TRACE=chrome (Chrome trace JSON, open in chrome://tracing or Perfetto) or
+# SKYMUSIC_TRACE=profile (cProfile stats of the traced stages), or through the app settings.
+# The session is written to SKYMUSIC_TRACE_DIR (default "traces") at exit.
+
+CHROME = "chrome"
+PROFILE = "profile"
+MODES = (CHROME, PROFILE)
+
+mode = None
+folder = "traces"
+events = []
+profiles = []
+local = threading.local()
+started = time.perf_counter_ns()
+
+
+class NullSpan:
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *exc):
+		return False
+
+	def set(self, **args):
+		pass
+
+NULL = NullSpan()
+
+
+class Span:
+
+	def __init__(self, name, args):
+		self.name = name
+		self.args = args
+
+	def __enter__(self):
+		if mode == PROFILE:
+			# cProfile only sees the thread that enabled it, so each thread profiles its outermost span
+			depth = getattr(local, "depth", 0)
+			local.depth = depth + 1
+			if not depth:
+				profiler = getattr(local, "profiler", None)
+				if profiler is None:
+					profiler = local.profiler = cProfile.Profile()
+					profiles.append(profiler)
+				profiler.enable()
+		self.start = time.perf_counter_ns()
+		return self
+
+	def __exit__(self, *exc):
+		end = time.perf_counter_ns()
+		if mode == PROFILE:
+			local.depth -= 1
+			if not local.depth:
+				local.profiler.disable()
+		events.append(dict(
+			name=self.name, ph="X", pid=os.getpid(), tid=threading.get_ident(),
+			ts=(self.start - started) / 1e3, dur=(end - self.start) / 1e3, args=self.args,
+		))
+		return False
+
+	def set(self, **args):
+		self.args.update(args)
+
+
+def span(name, **args):
+	"Times a pipeline stage: `with span(\"parse\", size=n) as s: ...; s.set(notes=k)`."
+	if mode is None:
+		return NULL
+	return Span(name, args)
+
+def enable(new_mode, trace_dir=None):
+	global mode, folder
+	if new_mode and new_mode not in MODES:
+		raise ValueError(f"Unknown trace mode: {new_mode}")
+	if trace_dir:
+		folder = trace_dir
+	mode = new_mode or None
+
+def dump(path=None):
+	"Writes the spans recorded so far (or the merged cProfile stats) and returns the path, or None if there is nothing."
+	if not events:
+		return None
+	stamp = time.strftime("%Y%m%d-%H%M%S")
+	os.makedirs(folder, exist_ok=True)
+	if profiles:
+		import pstats
+		path = path or os.path.join(folder, f"session-{stamp}.prof")
+		stats = pstats.Stats(profiles[0])
+		for profiler in profiles[1:]:
+			stats.add(profiler)
+		stats.dump_stats(path)
+	else:
+		path = path or os.path.join(folder, f"session-{stamp}.json")
+		with open(path, "wb") as f:
+			f.write(orjson.dumps(dict(traceEvents=list(events), displayTimeUnit="ms")))
+	return path
+
+@atexit.register
+def dump_session():
+	if mode is not None:
+		path = dump()
+		if path:
+			print(f"Trace written to {path}")
+
+
+env = os.environ.get("SKYMUSIC_TRACE", "").lower()
+if env in ("1", "on", "true"):
+	env = CHROME
+enable(env if env in MODES else None, os.environ.get("SKYMUSIC_TRACE_DIR"))
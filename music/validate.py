@@ -0,0 +1,217 @@
+import argparse
+import os
+import sys
+import time
+import numpy as np
+import orjson
+from music.automusic import open_collection, load_timeline, note_rate, timeline_options, NotConverted, SUPPORTED
+from music.backend import RecordingBackend
+from music.convert import has_hyperchoron, probe_formats
+from music.notes import popcount
+from music.scheduler import Scheduler
+
+# Headless validation of a songs folder: every sheet goes through the player's own
+# load -> convert -> compile -> schedule pipeline, but against a virtual clock and a recording
+# backend, so nothing is injected and a whole library plays back in far less than real time.
+# Dispatches are charged an estimated per-key cost on the virtual clock, which makes passages
+# too dense for the input backend show up as lateness.
+#   python -m music.validate [DIR] [--config config.json] [--json]
+
+SECOND = 1_000_000_000
+
+
+class VirtualClock:
+	"Stands in for perf_counter_ns; time only moves when the scheduler waits or a dispatch is charged."
+
+	def __init__(self, now=0):
+		self.now = now
+
+	def __call__(self):
+		return self.now
+
+	def advance(self, ns):
+		self.now += ns
+
+	def advance_to(self, ns):
+		if ns > self.now:
+			self.now = ns
+
+
+class VirtualScheduler(Scheduler):
+	"Jumps the virtual clock to each deadline instead of sleeping."
+
+	def wait_until(self, deadline):
+		if self.wake.is_set():
+			return False
+		self.clock.advance_to(deadline)
+		return True
+
+
+class CostedBackend(RecordingBackend):
+	"Records dispatches and charges call_cost + key_cost per key event to the virtual clock."
+
+	def __init__(self, clock, capacity, call_cost=10_000, key_cost=5_000):
+		super().__init__(capacity, clock)
+		self.call_cost = call_cost
+		self.key_cost = key_cost
+		self.busy = 0
+
+	def dispatch(self, up, down, deadline):
+		super().dispatch(up, down, deadline)
+		cost = self.call_cost + self.key_cost * (bin(up).count("1") + bin(down).count("1"))
+		self.busy += cost
+		self.clock.advance(cost)
+
+
+def peak_rate(times, weights=None, window=SECOND):
+	"Largest total weight of events falling in any window starting at an event."
+	if not len(times):
+		return 0
+	ends = np.searchsorted(times, times + window)
+	if weights is None:
+		return int((ends - np.arange(len(times))).max())
+	cumulative = np.concatenate(([0], np.cumsum(weights)))
+	return int((cumulative[ends] - cumulative[:len(times)]).max())
+
+def max_held(ups, downs):
+	held = peak = 0
+	for up, down in zip(ups.tolist(), downs.tolist()):
+		held = held & ~up | down
+		n = bin(held).count("1")
+		if n > peak:
+			peak = n
+	return peak
+
+def unmapped_mask(note_keys):
+	return sum(1 << i for i, key in enumerate(note_keys) if not key)
+
+def simulate(timeline, playback, unmapped=0, call_cost=10_000, key_cost=5_000):
+	"Plays timeline against a virtual clock; returns the per-song report fields."
+	clock = VirtualClock()
+	backend = CostedBackend(clock, 2 * len(timeline) + 16, call_cost=call_cost, key_cost=key_cost)
+	scheduler = VirtualScheduler(
+		backend.dispatch,
+		policy=playback["late_policy"],
+		drop_late=round(playback["drop_late_ms"] * 1e6),
+		lead_in=0,
+		hold=round(playback["hold_ms"] * 1e6),
+		clock=clock,
+	)
+	gap = timeline_options(playback)["gap"]
+	scheduler.play(timeline.times, timeline.masks, holds=timeline.holds, limits=timeline.release_limits(gap) if gap else None)
+	scheduled, actual, ups, downs = backend.events()
+	masks = np.asarray(timeline.masks)
+	sizes = popcount(masks)
+	late = backend.lateness()
+	duration = timeline.duration
+	events = popcount(ups) + popcount(downs)
+	return dict(
+		chords=len(timeline),
+		notes=int(sizes.sum()),
+		duration=duration / 1e9,
+		unmapped=timeline.dropped + int(popcount(masks & unmapped).sum()),
+		merged=timeline.merged,
+		delayed=timeline.delayed,
+		thinned=timeline.thinned,
+		chords_per_s=len(timeline) / (duration / 1e9) if duration else 0.0,
+		peak_chords_per_s=peak_rate(np.asarray(timeline.times)),
+		max_chord=int(sizes.max()) if len(sizes) else 0,
+		max_held=max_held(ups, downs),
+		dispatches=int(len(scheduled)),
+		peak_key_events_per_s=peak_rate(scheduled, events),
+		load=backend.busy / duration if duration else 0.0,
+		dropped=scheduler.dropped,
+		late_p99_ms=float(np.percentile(late, 99)) / 1e6 if len(late) else 0.0,
+		late_max_ms=int(late.max()) / 1e6 if len(late) else 0.0,
+	)
+
+def list_sheets(folder):
+	try:
+		entries = sorted(os.scandir(folder), key=lambda entry: entry.name)
+	except FileNotFoundError:
+		return []
+	return [entry.path for entry in entries if entry.name.rsplit(".", 1)[-1] in SUPPORTED and entry.is_file()]
+
+def validate_file(path, playback, unmapped=0, convert=True, **costs):
+	"Yields one report per song in the sheet at path; parse and conversion failures become error reports."
+	name = os.path.basename(path)
+	try:
+		collection = open_collection(path, try_hyperchoron=convert)
+	except NotConverted:
+		yield dict(file=name, song=None, error="not converted (run without --no-convert)")
+		return
+	except Exception as ex:
+		yield dict(file=name, song=None, error=f"{type(ex).__name__}: {ex}")
+		return
+	for index, title in enumerate(collection.titles()):
+		report = dict(file=name, song=index, name=title, error=None)
+		try:
+			song = collection.song(index)
+			timeline = load_timeline(path, index, song, **timeline_options(playback))
+			timeline = timeline.limit_density(note_rate(playback), playback["density_priority"])
+		except Exception as ex:
+			report["error"] = f"{type(ex).__name__}: {ex}"
+			yield report
+			continue
+		if not len(timeline):
+			report["error"] = "no playable notes"
+		report.update(simulate(timeline, playback, unmapped, **costs))
+		yield report
+
+def format_report(report):
+	label = report["file"] if report["song"] is None else f"{report['file']}[{report['song']}]"
+	if report["error"] and "chords" not in report:
+		return f"FAIL {label}: {report['error']}"
+	status = "FAIL" if report["error"] else ("WARN" if report["unmapped"] or report["dropped"] or report["load"] > 0.5 else "ok  ")
+	line = (
+		f"{status} {label}: {report['chords']} chords, {report['notes']} notes, {report['duration']:.1f}s, "
+		f"{report['chords_per_s']:.1f}/s (peak {report['peak_chords_per_s']}/s), max chord {report['max_chord']}, "
+		f"max held {report['max_held']}, peak {report['peak_key_events_per_s']} key events/s, load {report['load']:.1%}, "
+		f"late p99 {report['late_p99_ms']:.2f} ms max {report['late_max_ms']:.2f} ms"
+	)
+	if report["unmapped"]:
+		line += f", {report['unmapped']} unmapped"
+	if report["dropped"]:
+		line += f", {report['dropped']} dropped"
+	if report["merged"] or report["delayed"]:
+		line += f", {report['merged']} merged, {report['delayed']} delayed"
+	if report["thinned"]:
+		line += f", {report['thinned']} thinned"
+	if report["error"]:
+		line += f" ({report['error']})"
+	return line
+
+def main(argv=None):
+	from config import ConfigHandler
+	parser = argparse.ArgumentParser(prog="python -m music.validate", description="Validates every sheet in a songs folder without playing it.")
+	parser.add_argument("folder", nargs="?", help="songs folder (default: music_dir from the config)")
+	parser.add_argument("--config", default="config.json", help="config file providing the key mapping and playback settings")
+	parser.add_argument("--no-convert", action="store_true", help="report unconverted files instead of running hyperchoron")
+	parser.add_argument("--call-cost-us", type=float, default=10.0, help="estimated cost of one input dispatch")
+	parser.add_argument("--key-cost-us", type=float, default=5.0, help="estimated cost of each key event in a dispatch")
+	parser.add_argument("--json", action="store_true", help="print one JSON object per song instead of text")
+	args = parser.parse_args(argv)
+
+	config = ConfigHandler(args.config).read_config()
+	folder = args.folder or config["app"]["music_dir"] or "music/songs/"
+	if has_hyperchoron() and not args.no_convert:
+		SUPPORTED.update(probe_formats())
+	unmapped = unmapped_mask(config.note_keys)
+	costs = dict(call_cost=round(args.call_cost_us * 1e3), key_cost=round(args.key_cost_us * 1e3))
+
+	started = time.perf_counter()
+	songs = failed = 0
+	played = 0.0
+	for path in list_sheets(folder):
+		for report in validate_file(path, config["playback"], unmapped, convert=not args.no_convert, **costs):
+			songs += 1
+			failed += bool(report["error"])
+			played += report.get("duration", 0)
+			print(orjson.dumps(report).decode("utf-8") if args.json else format_report(report), flush=True)
+	elapsed = time.perf_counter() - started
+	print(f"{songs} songs, {failed} failed, {played:.0f}s of music validated in {elapsed:.2f}s", file=sys.stderr)
+	return 1 if failed else 0
+
+
+if __name__ == "__main__":
+	sys.exit(main())
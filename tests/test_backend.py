@@ -0,0 +1,40 @@
+import ctypes
+import sys
+import unittest
+from music.backend import DirectInputBackend, INPUT_KEYBOARD
+
+# Builds the real SendInput structures through pydirectinput, which only imports on Windows.
+#   python -m unittest tests.test_backend
+# Nothing is sent: the checks stop at bind() and chord(), before SendInput.
+
+try:
+	import pydirectinput
+except (ImportError, AttributeError):
+	pydirectinput = None
+
+
+@unittest.skipIf(pydirectinput is None, "pydirectinput needs Windows")
+class DirectInputBackendTest(unittest.TestCase):
+
+	def setUp(self):
+		self.backend = DirectInputBackend()
+		self.backend.bind(("y", "u", "", "i"))
+
+	def test_bind_builds_keyboard_inputs(self):
+		di = pydirectinput
+		for key, (up, down) in zip(("y", "u"), self.backend.inputs):
+			for item, flags in ((up, di.KEYEVENTF_SCANCODE | di.KEYEVENTF_KEYUP), (down, di.KEYEVENTF_SCANCODE)):
+				self.assertEqual(item.type, INPUT_KEYBOARD)
+				self.assertEqual(item.ii.ki.wScan, di.KEYBOARD_MAPPING[key])
+				self.assertEqual(item.ii.ki.dwFlags, flags)
+		self.assertEqual(self.backend.inputs[2], (None, None))
+
+	def test_chord_packs_one_buffer(self):
+		n, buffer = self.backend.chord(0b0001, 0b1010)
+		self.assertEqual(n, 3)
+		self.assertEqual(ctypes.sizeof(buffer), 3 * self.backend.size)
+		self.assertEqual([item.ii.ki.dwFlags & pydirectinput.KEYEVENTF_KEYUP for item in buffer], [pydirectinput.KEYEVENTF_KEYUP, 0, 0])
+
+
+if __name__ == "__main__":
+	unittest.main()